@@ -20,22 +20,32 @@ Within non-privileged Kubernetes containers, additional Docker containers
 cannot yet be launched. That functionality will need to wait for user-mode
 Docker
 """
+import concurrent.futures
+import copy
 import datetime
+import json
 import logging
 import os
+import random
 import string
 import subprocess
 import sys
 import tempfile
+import threading
 import time
+import types
 import uuid
 import yaml
 from argparse import ArgumentParser, _ArgumentGroup
-from typing import Any, Callable, Dict, List, Optional, TypeVar, Union
+from collections import OrderedDict
+from functools import lru_cache, partial
+from queue import Empty, Queue
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, TypeVar, Union
 
 import kubernetes
 import urllib3
 from kubernetes.client.rest import ApiException
+from kubernetes.watch.watch import iter_resp_lines
 
 from toil import applianceSelf
 from toil.batchSystems.abstractBatchSystem import (EXIT_STATUS_UNAVAILABLE_VALUE,
@@ -52,9 +62,51 @@ from toil.resource import Resource
 from toil.statsAndLogging import configure_root_logger, set_log_level
 
 logger = logging.getLogger(__name__)
+
+# These fields of Kubernetes objects are too boring to show in debug output.
+BORING_KUBERNETES_FIELDS = frozenset({'managedFields', 'selfLink'})
+
+# Translation table that deletes every ASCII character that can't go in a
+# Kubernetes owner name.
+KUBERNETES_OWNER_DELETIONS = str.maketrans('', '', ''.join(chr(i) for i in range(128)
+                                                           if chr(i) not in string.ascii_lowercase + string.digits + '-.'))
+
+# Use the fast C YAML emitter if PyYAML was built with it.
+YAMLDumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
 retryable_kubernetes_errors = [urllib3.exceptions.MaxRetryError,
                                urllib3.exceptions.ProtocolError,
                                ApiException]
+# The same errors as a tuple, for isinstance()
+retryable_kubernetes_error_types = tuple(retryable_kubernetes_errors)
+
+
+@lru_cache(maxsize=4096)
+def memory_quantity_to_bytes(quantity: str) -> int:
+    """
+    Convert a Kubernetes memory quantity string, like '123Ki', to bytes.
+
+    Our pods' memory limits only take a few different values, so we remember
+    the answers.
+    """
+    return human2bytes(quantity)
+
+
+@lru_cache(maxsize=None)
+def watched_type_for_doc(doc: str) -> str:
+    """
+    Given the docstring of a Kubernetes list method, get the name of the
+    model class for the items it lists (like 'V1Job'), the same way
+    kubernetes.watch.Watch does.
+    """
+    for line in doc.splitlines():
+        line = line.strip()
+        if line.startswith(':return:'):
+            return_type = line[len(':return:'):].strip()
+            if return_type.endswith('List'):
+                return_type = return_type[:-len('List')]
+            return return_type
+    raise ValueError('Cannot determine the type of watched objects')
 
 
 def is_retryable_kubernetes_error(e):
@@ -62,13 +114,478 @@ def is_retryable_kubernetes_error(e):
     A function that determines whether or not Toil should retry or stop given
     exceptions thrown by Kubernetes.
     """
-    for error in retryable_kubernetes_errors:
-        if isinstance(e, error):
-            return True
-    return False
+    return isinstance(e, retryable_kubernetes_error_types)
+
+
+class KubernetesJobSummary(NamedTuple):
+    """
+    The parts of a Kubernetes job's status that we need to decide what to do
+    with it, so we can scan a lot of jobs without digging through their
+    Kubernetes API objects.
+    """
+    job_id: int
+    succeeded: int
+    failed: int
+    start_time: Optional[datetime.datetime]
+    completion_time: Optional[datetime.datetime]
+
+
+def summarize_kubernetes_job(job: Any, prefix_length: int) -> KubernetesJobSummary:
+    """
+    Get the KubernetesJobSummary for a Kubernetes V1Job.
+
+    :param prefix_length: Length of the prefix on the job's name before the
+           batch system job ID.
+    """
+    job_id = int(job.metadata.name[prefix_length:])
+    status = job.status
+    if status is None:
+        return KubernetesJobSummary(job_id, 0, 0, None, None)
+    return KubernetesJobSummary(job_id, status.succeeded or 0, status.failed or 0,
+                                status.start_time, status.completion_time)
+
+
+class KubernetesInformer:
+    """
+    Keeps an in-memory copy of all the Kubernetes objects of one kind (jobs or
+    pods) that match a label selector.
+
+    The cache is seeded by listing the objects once, and then kept up to date
+    by a watch running in a background thread. When the watch ends (because it
+    timed out or because Kubernetes had problems), we list again and start a
+    new watch, so we can't stay out of sync for long. If watches keep failing
+    we back off, and if we aren't allowed to watch we just list periodically.
+
+    This means that asking "what objects do we have?" is a dict read instead
+    of a full paged list from the API server.
+    """
+
+    # How long should each watch request last before we re-list, in seconds?
+    watch_timeout = 5 * 60
+    # How many objects should we ask for per page when listing? This keeps
+    # the API server from having to build and send one huge response.
+    list_page_size = 500
+    # How many times in a row can Kubernetes refuse to let us watch before we
+    # give up on watching and just poll?
+    max_watch_denials = 3
+
+    def __init__(self, batch_system: 'KubernetesBatchSystem', api_kind: str, list_method_name: str,
+                 label_selector: str, index_label: Optional[str] = None,
+                 summarize: Optional[Callable[[Any], Any]] = None,
+                 changed: Optional[threading.Event] = None) -> None:
+        """
+        Make a new informer. It doesn't do anything until start() is called.
+
+        :param batch_system: The batch system to talk to Kubernetes through.
+        :param api_kind: The kind of API ('batch' or 'core') that lists the objects.
+        :param list_method_name: The name of the namespaced list method on
+               that API, like 'list_namespaced_job'.
+        :param label_selector: Selector for the objects we want to track.
+        :param index_label: If set, also index the objects by the value of this
+               label, so they can be found with get_by_label().
+        :param summarize: If set, keep the result of this function on each
+               object, so summaries() can be scanned quickly.
+        :param changed: If set, this event is set whenever the cluster tells
+               us about a change, so someone can wait for things to happen.
+        """
+        self._batch_system = batch_system
+        self._api_kind = api_kind
+        self._list_method_name = list_method_name
+        self._label_selector = label_selector
+        self._index_label = index_label
+        self._summarize = summarize
+        self._changed = changed
+
+        # This protects all the state below
+        self._lock = threading.RLock()
+        # Maps from object name to the most recent version of the object
+        self._objects: Dict[str, Any] = {}
+        # Maps from index label value to object name
+        self._by_label: Dict[str, str] = {}
+        # Maps from object name to summary, if we are summarizing
+        self._summaries: Dict[str, Any] = {}
+        # The names of objects we know are gone from the cluster, but that an
+        # old list or watch event might still tell us about.
+        self._gone: Set[str] = set()
+        # The names of objects we put in the cache ourselves, that we haven't
+        # heard about from the cluster yet. A list served from the API
+        # server's watch cache might be slightly behind and not include them.
+        self._unconfirmed: Set[str] = set()
+        # Set to False if our Kubernetes client module is too old to ask for
+        # lists that can be served from the API server's watch cache.
+        self._use_resource_version_match = True
+        # How many times in a row we have been forbidden from watching
+        self._watch_denials = 0
+
+        # Set when we should stop watching
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _list_method(self) -> Callable[..., Any]:
+        """
+        Get the Kubernetes API method that lists our objects.
+        """
+        return getattr(self._batch_system._api(self._api_kind), self._list_method_name)
+
+    def start(self) -> None:
+        """
+        Fill the cache, and start keeping it up to date in the background.
+
+        The first list is done in the calling thread, so that readers never
+        see an empty cache just because we haven't looked yet, and so that
+        errors talking to Kubernetes come out here.
+        """
+        resource_version = self._resync()
+        self._thread = threading.Thread(target=self._run, args=(resource_version,), daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop updating the cache. The watch thread will exit the next time it
+        hears from Kubernetes, or when its watch times out.
+        """
+        self._stopped.set()
+
+    def _run(self, resource_version: Optional[str]) -> None:
+        """
+        Main loop of the watch thread.
+        """
+        backoff = self._batch_system.min_poll_interval
+        while not self._stopped.is_set():
+            watch_start = time.monotonic()
+            # We only go right back to watching if this watch told us
+            # something; otherwise we might just be hammering a cluster that
+            # can't or won't talk to us.
+            heard_something = False
+            try:
+                if resource_version is None:
+                    # We need to (re-)list to know where to watch from.
+                    resource_version = self._resync()
+                if self._watch_denials < self.max_watch_denials:
+                    heard_something = self._watch(resource_version)
+            except Exception as e:
+                # We can't let this thread die, or the cache would go stale
+                # forever. Back off and start over.
+                logger.warning("Error keeping Kubernetes %s cache up to date: %s",
+                               self._list_method_name, e)
+                self._batch_system._reload_credentials_if_rejected(e)
+            if self._stopped.is_set():
+                return
+            # When the watch ends, for any reason, list again so we don't miss
+            # anything that happened in between.
+            resource_version = None
+            if heard_something:
+                backoff = self._batch_system.min_poll_interval
+            else:
+                # If we aren't watching at all, this is how we poll.
+                backoff = self._batch_system._back_off_after_watch(watch_start, backoff,
+                                                                   watch_timeout=self.watch_timeout)
+
+    def _watch(self, resource_version: Optional[str]) -> bool:
+        """
+        Watch for changes from the given resource version, and apply them to
+        the cache, until the watch times out or we are stopped.
+
+        Errors from the watch are raised. If Kubernetes won't let us watch too
+        many times in a row, we stop trying to watch and just poll.
+
+        :return: True if we got any events from the watch.
+        """
+        kwargs = {'label_selector': self._label_selector,
+                  'timeout_seconds': self.watch_timeout}
+        if resource_version is not None:
+            kwargs['resource_version'] = resource_version
+        method = self._list_method()
+        item_type = watched_type_for_doc(method.__doc__)
+        heard_something = False
+        try:
+            for event in self._batch_system._stream_watch_events(method,
+                                                                 self._batch_system.namespace,
+                                                                 deserialize=False,
+                                                                 **kwargs):
+                heard_something = True
+                self._apply_raw(event['type'], event['raw_object'], item_type)
+                if self._stopped.is_set():
+                    break
+        except ApiException as e:
+            if e.status == 403:
+                # We may be allowed to list but not watch.
+                self._watch_denials += 1
+                if self._watch_denials >= self.max_watch_denials:
+                    logger.warning("Not allowed to watch Kubernetes %s; polling instead",
+                                   self._list_method_name)
+            raise
+        self._watch_denials = 0
+        return heard_something
+
+    def _list_page(self, token: Optional[str]) -> Any:
+        """
+        Get one page of our objects from the cluster.
+
+        :param token: The continuation token from the previous page, or None
+               for the first page.
+        """
+        # We can't just pass e.g. a None continue token when there isn't
+        # one, because the Kubernetes module reads its kwargs dict and
+        # cares about presence/absence. So we build a dict to send.
+        kwargs = {'label_selector': self._label_selector,
+                  'limit': self.list_page_size}
+        if token is not None:
+            kwargs['_continue'] = token
+        else:
+            # Let the API server answer from its watch cache, instead of
+            # doing a consistent read from etcd. It's fine if the answer
+            # is a little behind; the watch will catch us up. This isn't
+            # allowed along with a continue token.
+            kwargs['resource_version'] = '0'
+            if self._use_resource_version_match:
+                kwargs['resource_version_match'] = 'NotOlderThan'
+        try:
+            return self._batch_system._try_kubernetes(self._list_method(), self._batch_system.namespace, **kwargs)
+        except TypeError:
+            if 'resource_version_match' not in kwargs:
+                raise
+            # Our Kubernetes module predates resource_version_match, so
+            # just use the resource version.
+            self._use_resource_version_match = False
+            del kwargs['resource_version_match']
+            return self._batch_system._try_kubernetes(self._list_method(), self._batch_system.namespace, **kwargs)
+
+    def _resync(self) -> Optional[str]:
+        """
+        List all our objects from the cluster and replace the cache contents.
+
+        :return: The resource version to start watching from.
+        """
+        objects: Dict[str, Any] = {}
+        resource_version = None
+        # While we go through each page, we fetch the next one in the
+        # background, so we aren't waiting on the API server the whole time.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+            next_page = pool.submit(self._list_page, None)
+            while next_page is not None:
+                results = next_page.result()
+                resource_version = getattr(results.metadata, 'resource_version', None)
+                # Get the continuation token, if any
+                token = getattr(results.metadata, '_continue', None)
+                # If there is one, start on the next page. Otherwise, we got
+                # everything.
+                next_page = pool.submit(self._list_page, token) if token else None
+                for item in results.items:
+                    objects[item.metadata.name] = item
+
+        with self._lock:
+            # The cluster has now told us about anything it listed
+            self._unconfirmed.difference_update(objects)
+            for name in self._unconfirmed:
+                # But keep anything we made that the list was too early to see.
+                if name in self._objects:
+                    objects[name] = self._objects[name]
+            # Anything we were told is gone and isn't listed really is gone,
+            # so we don't need to remember it anymore.
+            self._gone.intersection_update(objects)
+            for name in self._gone:
+                # And anything we were told is gone shouldn't come back.
+                del objects[name]
+            self._objects = objects
+            self._by_label = {}
+            self._summaries = {}
+            for name, item in objects.items():
+                self._index(name, item)
+        self._notify()
+        return resource_version
+
+    def _notify(self) -> None:
+        """
+        Let anyone waiting know that the cluster told us something.
+        """
+        if self._changed is not None:
+            self._changed.set()
+
+    def _index(self, name: str, item: Any) -> None:
+        """
+        Add the given object to the label index and summaries, if we have
+        them.
+
+        Must be called with the lock held.
+        """
+        if self._summarize is not None:
+            self._summaries[name] = self._summarize(item)
+        if self._index_label is not None:
+            value = (item.metadata.labels or {}).get(self._index_label)
+            if value is not None:
+                self._by_label[value] = name
+
+    def _unindex(self, name: str, item: Any) -> None:
+        """
+        Remove the given object from the label index and summaries, if we
+        have them.
+
+        Must be called with the lock held.
+        """
+        self._summaries.pop(name, None)
+        if self._index_label is not None:
+            value = (item.metadata.labels or {}).get(self._index_label)
+            if value is not None and self._by_label.get(value) == name:
+                del self._by_label[value]
+
+    def _apply_raw(self, event_type: str, raw_object: Dict[str, Any], item_type: str) -> None:
+        """
+        Update the cache according to a watch event that hasn't been turned
+        into a Kubernetes API object yet.
+
+        Making the API object is slow, so we only do it if we are going to
+        keep it.
+        """
+        if event_type not in ('ADDED', 'MODIFIED', 'DELETED'):
+            # Probably a bookmark; nothing to store.
+            return
+        name = raw_object['metadata']['name']
+        if event_type == 'DELETED':
+            self._remove(name)
+            return
+        with self._lock:
+            if name in self._gone:
+                # This is old news about something we already got rid of.
+                return
+        self._apply(event_type, self._batch_system._deserialize(raw_object, item_type))
+
+    def _remove(self, name: str) -> None:
+        """
+        Drop an object from the cache because the cluster says it is gone.
+        """
+        with self._lock:
+            self._gone.discard(name)
+            self._unconfirmed.discard(name)
+            old = self._objects.pop(name, None)
+            if old is not None:
+                self._unindex(name, old)
+        self._notify()
+
+    def _apply(self, event_type: str, item: Any) -> None:
+        """
+        Update the cache according to a watch event.
+        """
+        name = item.metadata.name
+        with self._lock:
+            if event_type == 'DELETED':
+                self._remove(name)
+            elif event_type in ('ADDED', 'MODIFIED'):
+                if name in self._gone:
+                    # This is old news about something we already got rid of.
+                    return
+                self._unconfirmed.discard(name)
+                self._store(name, item)
+        self._notify()
+
+    def _store(self, name: str, item: Any) -> None:
+        """
+        Add or replace an object in the cache.
+
+        Must be called with the lock held.
+        """
+        old = self._objects.get(name)
+        if old is not None:
+            self._unindex(name, old)
+        self._objects[name] = item
+        self._index(name, item)
+
+    def put(self, item: Any) -> None:
+        """
+        Add or replace an object in the cache. Useful for objects we are
+        creating, so we don't have to wait for the watch to hear about them.
+
+        Doesn't replace anything the cluster has already told us about, since
+        that is at least as new as anything we could have.
+        """
+        name = item.metadata.name
+        with self._lock:
+            if name in self._objects and name not in self._unconfirmed:
+                return
+            self._unconfirmed.add(name)
+            self._store(name, item)
+
+    def forget(self, name: str) -> None:
+        """
+        Drop the object with the given name from the cache, because we know
+        it is gone from the cluster (or is going away and should not be
+        considered anymore).
+        """
+        with self._lock:
+            self._gone.add(name)
+            self._unconfirmed.discard(name)
+            old = self._objects.pop(name, None)
+            if old is not None:
+                self._unindex(name, old)
+
+    def values(self) -> List[Any]:
+        """
+        Get a snapshot of all the objects in the cache.
+        """
+        with self._lock:
+            return list(self._objects.values())
+
+    def get(self, name: str) -> Optional[Any]:
+        """
+        Get the object with the given name, if we have it.
+        """
+        with self._lock:
+            return self._objects.get(name)
+
+    def summarized_values(self) -> List[Tuple[Any, Any]]:
+        """
+        Get a snapshot of all the objects in the cache, each paired with its
+        summary.
+        """
+        with self._lock:
+            return [(item, self._summaries.get(name)) for name, item in self._objects.items()]
+
+    def summaries(self) -> Dict[str, Any]:
+        """
+        Get a snapshot of the summaries of all the objects in the cache, by
+        object name.
+        """
+        with self._lock:
+            return dict(self._summaries)
+
+    def get_by_label(self, value: str) -> Optional[Any]:
+        """
+        Get the object whose index label has the given value, if any.
+        """
+        with self._lock:
+            name = self._by_label.get(value)
+            return self._objects.get(name) if name is not None else None
 
 
 class KubernetesBatchSystem(BatchSystemCleanupSupport):
+    # How many stopped pods' logs should we keep around?
+    finished_pod_log_cache_size = 16
+    # How many job creation requests can we have going at once?
+    job_creation_threads = 16
+    # And how many deletion requests, when deleting a lot of things?
+    job_deletion_threads = 16
+    # How many connections to Kubernetes should we keep around? We want
+    # enough for all the threads above, plus the watches.
+    connection_pool_size = 40
+    # When killing more than this many jobs, delete them by label selector
+    # instead of one at a time.
+    kill_collection_threshold = 8
+    # And delete up to this many with each selector.
+    kill_collection_size = 100
+    # How long should each watch for an object to be deleted last before we
+    # check on the object again, in seconds?
+    deletion_watch_timeout = 60
+    # How long should we wait between checks on the cluster when a watch
+    # ends early, at first, in seconds? The maximum is an option.
+    min_poll_interval = 0.1
+    # How long after loading our credentials should we ignore them being
+    # rejected, in seconds? Lots of threads can find out about expired
+    # credentials at once, and only one of them needs to reload them.
+    credential_reload_interval = 10
+    # How long should we reuse pod memory usage from the metrics service, in
+    # seconds?
+    pod_memory_poll_interval = 15
+
     @classmethod
     def supportsAutoDeployment(cls):
         return True
@@ -83,13 +600,27 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
         logging.getLogger('kubernetes').setLevel(logging.ERROR)
         logging.getLogger('requests_oauthlib').setLevel(logging.ERROR)
 
-        # This will hold the last time our Kubernetes credentials were refreshed
-        self.credential_time = None
+        # This will hold where we got our Kubernetes credentials from ('kube'
+        # or 'in_cluster')
+        self.config_source: Optional[str] = None
         # And this will hold our cache of API objects
         self._apis = {}
+        # This protects loading credentials into the API objects, which can
+        # happen from any of our threads.
+        self._credentials_lock = threading.Lock()
+        # And this is time.monotonic() when we last loaded them.
+        self._credentials_loaded_at: Optional[float] = None
+        # And this will hold our namespace once we know it
+        self._namespace_cached: Optional[str] = None
 
         # Get our namespace (and our Kubernetes credentials to make sure they exist)
         self.namespace = self._api('namespace')
+        # Our API objects stay the same even when our credentials are
+        # reloaded, so we can hold on to them instead of asking _api() for
+        # them for every call.
+        self.batch_api: kubernetes.client.BatchV1Api = self._api('batch')
+        self.core_api: kubernetes.client.CoreV1Api = self._api('core')
+        self.custom_api: kubernetes.client.CustomObjectsApi = self._api('customObjects')
 
         # Decide if we are going to mount a Kubernetes host path as the Toil
         # work dir in the workers, for shared caching.
@@ -98,6 +629,11 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
         # Get the service account name to use, if any.
         self.service_account = config.kubernetes_service_account
 
+        # Get the longest it is acceptable to wait between checks on the
+        # cluster when things go wrong.
+        # Never poll faster than our minimum, even if configured to.
+        self.poll_max_interval = max(config.kubernetes_poll_max_interval, self.min_poll_interval)
+
         # Get the username to mark jobs with
         username = config.kubernetes_owner
         # And a unique ID for the run
@@ -105,6 +641,8 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
 
         # Create a prefix for jobs, starting with our username
         self.job_prefix = f'{username}-toil-{self.unique_id}-'
+        # We cut the prefix off a lot of job names to get their IDs.
+        self._job_prefix_length = len(self.job_prefix)
         # Instead of letting Kubernetes assign unique job names, we assign our
         # own based on a numerical job ID. This functionality is managed by the
         # BatchSystemLocalSupport.
@@ -116,7 +654,9 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
         # lost job recovery interval) timeouts of e.g. CWL Kubernetes
         # conformance tests. To work around this, we tag all our jobs with an
         # explicit TTL that is long enough that we're sure we can deal with all
-        # the finished jobs before they expire.
+        # the finished jobs before they expire. We delete jobs ourselves as
+        # soon as we collect them, so this only matters for jobs we never get
+        # to, like if the leader dies.
         self.finished_job_ttl = 3600  # seconds
 
         # Here is where we will store the user script resource object if we get one.
@@ -140,18 +680,73 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
         # Get the name of the AWS secret, if any, to mount in containers.
         self.aws_secret_name = os.environ.get("TOIL_AWS_SECRET_NAME", None)
 
+        # Now we know enough to make the volumes every job needs.
+        self._volumes, self._mounts = self._create_volumes()
+
         # Set this to True to enable the experimental wait-for-job-update code
         self.enable_watching = os.environ.get("KUBE_WATCH_ENABLED", False)
 
         # This will be a label to select all our jobs.
         self.run_id = f'toil-{self.unique_id}'
+        # And this is the selector for it, which we use a lot.
+        self._run_label_selector = f"toil_run={self.run_id}"
+
+        # This is the metadata to label each job/pod with, except for the
+        # name. Don't let the cluster autoscaler evict any Toil jobs.
+        self._job_metadata_template = kubernetes.client.V1ObjectMeta(labels={"toil_run": self.run_id},
+                                                                     annotations={"cluster-autoscaler.kubernetes.io/safe-to-evict": "false"})
+
+        # We send jobs to Kubernetes from a pool of threads. This holds the
+        # in-progress creation futures by job name.
+        self._creation_pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.job_creation_threads)
+        self._creations: Dict[str, concurrent.futures.Future] = {}
+        # And this holds the IDs of jobs we couldn't create, to report as failed.
+        self._failed_creations: "Queue[int]" = Queue()
+
+        # Logs can be big, so we only remember the logs of a few stopped
+        # pods, by pod UID.
+        self._finished_pod_logs: "OrderedDict[str, str]" = OrderedDict()
+
+        # This holds the memory usage of our pods, by pod name, as of the
+        # last time we asked the metrics service (if we have).
+        self._pod_memory: Dict[str, int] = {}
+        self._pod_memory_time: Optional[float] = None
+
+        # This gets set whenever something happens to our jobs or pods, so
+        # getUpdatedBatchJob() can wait for that instead of polling.
+        self._cluster_changed = threading.Event()
+
+        # Keep track of our jobs and their pods with watches, instead of
+        # listing them all from the cluster whenever we want to look at them.
+        self._job_informer = KubernetesInformer(self, 'batch', 'list_namespaced_job',
+                                                label_selector=self._run_label_selector,
+                                                summarize=partial(summarize_kubernetes_job,
+                                                                  prefix_length=self._job_prefix_length),
+                                                changed=self._cluster_changed)
+        # Kubernetes labels each job's pods with the job's name.
+        self._pod_informer = KubernetesInformer(self, 'core', 'list_namespaced_pod',
+                                                label_selector=self._run_label_selector,
+                                                index_label='job-name',
+                                                changed=self._cluster_changed)
+        self._job_informer.start()
+        self._pod_informer.start()
+
+        # Jobs we have collected the results of get deleted in the
+        # background, so we don't hold up reporting the next finished job.
+        # Stuff job names in here, or None to stop the deleting thread.
+        self._deletion_queue: "Queue[Optional[str]]" = Queue()
+        self._deletion_thread = threading.Thread(target=self._delete_finished_jobs, daemon=True)
+        self._deletion_thread.start()
 
     def _pretty_print(self, kubernetes_object: Any) -> str:
         """
-        Pretty-print a Kubernetes API object to a YAML string. Recursively
-        drops boring fields.
+        Pretty-print a Kubernetes API object to a YAML string. Drops boring
+        fields at all levels.
         Takes any Kubernetes API object; not clear if any base type exists for
         them.
+
+        This is slow, so callers should only use it if the result will
+        actually be logged.
         """
 
         if not kubernetes_object:
@@ -160,110 +755,176 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
         # We need a Kubernetes widget that knows how to translate
         # its data structures to nice YAML-able dicts. See:
         # <https://github.com/kubernetes-client/python/issues/1117#issuecomment-939957007>
-        api_client = kubernetes.client.ApiClient()
+        # Any ApiClient will do, so use one we already have instead of making
+        # a new one with its own connection pool.
+        api_client = self.batch_api.api_client
 
         # Convert to a dict
         root_dict = api_client.sanitize_for_serialization(kubernetes_object)
 
-        def drop_boring(here):
-            """
-            Drop boring fields recursively.
-            """
-            boring_keys = []
-            for k, v in here.items():
-                if isinstance(v, dict):
-                    drop_boring(v)
-                if k in ['managedFields']:
-                    boring_keys.append(k)
-            for k in boring_keys:
-                del here[k]
+        # Drop boring fields everywhere, including in dicts in lists (like
+        # containers). Use a stack instead of recursion since these objects
+        # can nest deeply.
+        stack = [root_dict]
+        while stack:
+            here = stack.pop()
+            if isinstance(here, dict):
+                for k in list(here.keys()):
+                    if k in BORING_KUBERNETES_FIELDS:
+                        del here[k]
+                    elif isinstance(here[k], (dict, list)):
+                        stack.append(here[k])
+            else:
+                stack.extend(v for v in here if isinstance(v, (dict, list)))
 
-        drop_boring(root_dict)
-        return yaml.dump(root_dict)
+        # Use the C YAML emitter if we have it.
+        return yaml.dump(root_dict, Dumper=YAMLDumper)
 
-    def _api(self, kind, max_age_seconds = 5 * 60):
+    def _reload_credentials(self) -> None:
         """
+        Load our Kubernetes credentials, and point our Kubernetes API objects
+        at them.
+
         The Kubernetes module isn't clever enough to renew its credentials when
-        they are about to expire. See
+        they expire. See
         https://github.com/kubernetes-client/python/issues/741.
 
-        We work around this by making sure that every time we are about to talk
-        to Kubernetes, we have fresh credentials. And we do that by reloading
-        the config and replacing our Kubernetes API objects before we do any
-        Kubernetes things.
+        Instead of reloading them on a timer, we reload them when Kubernetes
+        tells us they aren't good anymore (see _reload_credentials_if_rejected()).
+        The API objects are kept and given new clients, so bound methods that
+        are being retried pick up the new credentials. The old client's
+        connections are closed.
 
-        TODO: We can still get in trouble if a single watch or listing loop
-        goes on longer than our credentials last, though.
+        Must be called with _credentials_lock held.
+        """
+
+        try:
+            # Load ~/.kube/config or KUBECONFIG
+            kubernetes.config.load_kube_config()
+            # Worked. We're using kube config
+            self.config_source = 'kube'
+        except kubernetes.config.ConfigException:
+            # Didn't work. Try pod-based credentials in case we are in a pod.
+            try:
+                kubernetes.config.load_incluster_config()
+                # Worked. We're using in_cluster config
+                self.config_source = 'in_cluster'
+            except kubernetes.config.ConfigException:
+                raise RuntimeError('Could not load Kubernetes configuration from ~/.kube/config, $KUBECONFIG, or current pod.')
+
+        # Make one ApiClient, and so one connection pool, for all the API
+        # objects to share. Copying the default configuration picks up the
+        # newly loaded credentials. Make the pool big enough for all our
+        # threads to have connections at once.
+        configuration = kubernetes.client.Configuration.get_default_copy()
+        configuration.connection_pool_maxsize = self.connection_pool_size
+        api_client = kubernetes.client.ApiClient(configuration)
+
+        # Now fill in the API objects with these credentials
+        old_api_client = None
+        for kind, api_type in [('batch', kubernetes.client.BatchV1Api),
+                               ('core', kubernetes.client.CoreV1Api),
+                               ('customObjects', kubernetes.client.CustomObjectsApi)]:
+            if kind in self._apis:
+                old_api_client = self._apis[kind].api_client
+                self._apis[kind].api_client = api_client
+            else:
+                self._apis[kind] = api_type(api_client)
+        self._credentials_loaded_at = time.monotonic()
+
+        if old_api_client is not None:
+            # Don't leave the old connections open. Requests still using them
+            # will finish, and their connections won't be reused.
+            old_api_client.rest_client.pool_manager.clear()
+            old_api_client.close()
 
+    def _reload_credentials_if_rejected(self, e: Exception) -> None:
+        """
+        If the given error means that Kubernetes didn't like our credentials
+        (because they expired), reload them so that a retry can succeed.
+
+        Only a 401 Unauthorized means that; a 403 Forbidden means our
+        credentials are fine but aren't allowed to do what we asked. If
+        another thread just reloaded the credentials, we leave them alone.
+        """
+        if isinstance(e, ApiException) and e.status == 401:
+            with self._credentials_lock:
+                if self._credentials_loaded_at is not None and \
+                        time.monotonic() - self._credentials_loaded_at < self.credential_reload_interval:
+                    # Someone else already got new credentials; the retry
+                    # will use them.
+                    return
+                logger.warning('Kubernetes rejected our credentials; reloading them')
+                self._reload_credentials()
+
+    def _api(self, kind):
+        """
         This method is the Right Way to get any Kubernetes API. You call it
         with the API you want ('batch', 'core', or 'customObjects') and it
-        returns an API object with guaranteed fresh credentials.
+        returns an API object. Credentials are loaded the first time an API is
+        needed, and are reloaded by _try_kubernetes() and friends if they stop
+        working. The same API objects are returned every time, and are also
+        available as self.batch_api, self.core_api, and self.custom_api.
 
         It also recognizes 'namespace' and returns our namespace as a string.
-
-        max_age_seconds needs to be << your cluster's credential expiry time.
+        The namespace can't change while we run, so it is only worked out
+        once.
         """
 
-        now = utc_now()
+        if not self._apis:
+            with self._credentials_lock:
+                if not self._apis:
+                    # Nothing is loaded yet
+                    self._reload_credentials()
 
-        if self.credential_time is None or (now - self.credential_time).total_seconds() > max_age_seconds:
-            # Credentials need a refresh
-            try:
-                # Load ~/.kube/config or KUBECONFIG
-                kubernetes.config.load_kube_config()
-                # Worked. We're using kube config
-                config_source = 'kube'
-            except kubernetes.config.ConfigException:
-                # Didn't work. Try pod-based credentials in case we are in a pod.
-                try:
-                    kubernetes.config.load_incluster_config()
-                    # Worked. We're using in_cluster config
-                    config_source = 'in_cluster'
-                except kubernetes.config.ConfigException:
-                    raise RuntimeError('Could not load Kubernetes configuration from ~/.kube/config, $KUBECONFIG, or current pod.')
-
-            # Now fill in the API objects with these credentials
-            self._apis['batch'] = kubernetes.client.BatchV1Api()
-            self._apis['core'] = kubernetes.client.CoreV1Api()
-            self._apis['customObjects'] = kubernetes.client.CustomObjectsApi()
-
-            # And save the time
-            self.credential_time = now
         if kind == 'namespace':
-            # We just need the namespace string
-            if config_source == 'in_cluster':
-                # Our namespace comes from a particular file.
-                with open("/var/run/secrets/kubernetes.io/serviceaccount/namespace") as fh:
-                    return fh.read().strip()
-            else:
-                # Find all contexts and the active context.
-                # The active context gets us our namespace.
-                contexts, activeContext = kubernetes.config.list_kube_config_contexts()
-                if not contexts:
-                    raise RuntimeError("No Kubernetes contexts available in ~/.kube/config or $KUBECONFIG")
+            if self._namespace_cached is None:
+                self._namespace_cached = self._find_namespace()
+            return self._namespace_cached
 
-                # Identify the namespace to work in
-                return activeContext.get('context', {}).get('namespace', 'default')
+        # We need an API object
+        try:
+            return self._apis[kind]
+        except KeyError:
+            raise RuntimeError(f"Unknown Kubernetes API type: {kind}")
 
+    def _find_namespace(self) -> str:
+        """
+        Work out what namespace we should be working in, from the Kubernetes
+        configuration that was loaded.
+        """
+        if self.config_source == 'in_cluster':
+            # Our namespace comes from a particular file.
+            with open("/var/run/secrets/kubernetes.io/serviceaccount/namespace") as fh:
+                return fh.read().strip()
         else:
-            # We need an API object
-            try:
-                return self._apis[kind]
-            except KeyError:
-                raise RuntimeError(f"Unknown Kubernetes API type: {kind}")
+            # Find all contexts and the active context.
+            # The active context gets us our namespace.
+            contexts, activeContext = kubernetes.config.list_kube_config_contexts()
+            if not contexts:
+                raise RuntimeError("No Kubernetes contexts available in ~/.kube/config or $KUBECONFIG")
+
+            # Identify the namespace to work in
+            return activeContext.get('context', {}).get('namespace', 'default')
 
     @retry(errors=retryable_kubernetes_errors)
     def _try_kubernetes(self, method, *args, **kwargs):
         """
         Kubernetes API can end abruptly and fail when it could dynamically backoff and retry.
 
-        For example, calling self._api('batch').create_namespaced_job(self.namespace, job),
+        For example, calling self.batch_api.create_namespaced_job(self.namespace, job),
         Kubernetes can behave inconsistently and fail given a large job. See
         https://github.com/DataBiosphere/toil/issues/2884.
 
         This function gives Kubernetes more time to try an executable api.
+
+        If our credentials have expired, they are reloaded before the retry.
         """
-        return method(*args, **kwargs)
+        try:
+            return method(*args, **kwargs)
+        except ApiException as e:
+            self._reload_credentials_if_rejected(e)
+            raise
 
     @retry(errors=retryable_kubernetes_errors + [
                ErrorCondition(
@@ -277,28 +938,68 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
         encountered (because we are waiting for them) instead of retrying on
         them.
         """
-        return method(*args, **kwargs)
+        try:
+            return method(*args, **kwargs)
+        except ApiException as e:
+            self._reload_credentials_if_rejected(e)
+            raise
+
+    def _deserialize(self, raw_object: Dict[str, Any], item_type: str) -> Any:
+        """
+        Turn a dict from the Kubernetes API into an API object of the given
+        type name (like 'V1Job').
+        """
+        # The Kubernetes module only knows how to deserialize responses.
+        response = types.SimpleNamespace(data=json.dumps(raw_object))
+        return self.batch_api.api_client.deserialize(response, item_type)
+
+    def _stream_watch_events(self, method, *args, deserialize: bool = True, **kwargs):
+        """
+        Make one watch request with the given Kubernetes API list method, and
+        yield the events from it as dicts with 'type', 'raw_object', and (if
+        deserialize is set) 'object' keys.
+
+        This is like kubernetes.watch.Watch().stream(), but it doesn't make
+        a new ApiClient for every watch, it only decodes each event's JSON
+        once, and it can skip building Kubernetes API objects for callers who
+        can make do with the raw dicts. It also doesn't try to restart the
+        watch when the request ends.
+        """
+        item_type = watched_type_for_doc(method.__doc__) if deserialize else None
+        response = method(*args, watch=True, _preload_content=False, **kwargs)
+        try:
+            for line in iter_resp_lines(response):
+                event = json.loads(line)
+                event['raw_object'] = event['object']
+                if event['type'] == 'ERROR':
+                    error = event['raw_object']
+                    raise ApiException(status=error.get('code'),
+                                       reason=f"{error.get('reason')}: {error.get('message')}")
+                if item_type is not None and event['type'] != 'BOOKMARK':
+                    event['object'] = self._deserialize(event['raw_object'], item_type)
+                yield event
+        finally:
+            response.close()
+            response.release_conn()
 
     def _try_kubernetes_stream(self, method, *args, **kwargs):
         """
-        Kubernetes kubernetes.watch.Watch().stream() streams can fail and raise
-        errors. We don't want to have those errors fail the entire workflow, so
-        we handle them here.
+        Kubernetes watch streams can fail and raise errors. We don't want to
+        have those errors fail the entire workflow, so we handle them here.
 
         When you want to stream the results of a Kubernetes API method, call
-        this instead of stream().
+        this instead of kubernetes.watch.Watch().stream(). Pass
+        deserialize=False to only get the raw dicts for the objects.
 
         To avoid having to do our own timeout logic, we finish the watch early
         if it produces an error.
         """
 
-        w = kubernetes.watch.Watch()
-
         # We will set this to bypass our second catch in the case of user errors.
         userError = False
 
         try:
-            for item in w.stream(method, *args, **kwargs):
+            for item in self._stream_watch_events(method, *args, **kwargs):
                 # For everything the watch stream gives us
                 try:
                     # Show the item to user code
@@ -315,6 +1016,7 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
                 raise
             else:
                 # It was from the Kubernetes watch generator we manage.
+                self._reload_credentials_if_rejected(e)
                 if is_retryable_kubernetes_error(e):
                     # This is just cloud weather.
                     # TODO: We will also get an APIError if we just can't code good against Kubernetes. So make sure to warn.
@@ -339,6 +1041,31 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
         runs on the right kind of nodes, according to whether it is allowed to
         be preempted.
 
+        See _create_placement_constraints() for how the nodes are chosen.
+        """
+
+        node_affinity, tolerations = KubernetesBatchSystem._create_placement_constraints(preemptable)
+
+        if node_affinity is not None:
+            # Apply the affinity
+            pod_spec.affinity = node_affinity
+
+        if tolerations:
+            # Apply the tolerations
+            pod_spec.tolerations = tolerations
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _create_placement_constraints(preemptable: bool) -> Tuple[Optional[kubernetes.client.V1NodeAffinity],
+                                                                    List[kubernetes.client.V1Toleration]]:
+        """
+        Make the node affinity (or None) and the list of tolerations that will
+        make a pod run on the right kind of nodes, according to whether it is
+        allowed to be preempted.
+
+        There are only two possible answers, so they are made once and shared
+        between all the pod specs that need them.
+
         Preemptable jobs will be able to run on preemptable or non-preemptable
         nodes, and will prefer preemptable nodes if available.
 
@@ -420,51 +1147,18 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
                 node_affinity = kubernetes.client.V1NodeAffinity(
                     required_during_scheduling_ignored_during_execution=node_selector
                 )
-            # Apply the affinity
-            pod_spec.affinity = node_affinity
+        else:
+            node_affinity = None
 
-        if tolerations:
-            # Apply the tolerations
-            pod_spec.tolerations = tolerations
+        return node_affinity, tolerations
 
-    def _create_pod_spec(
-            self,
-            job_desc: JobDescription,
-            job_environment: Optional[Dict[str, str]] = None
-    ) -> kubernetes.client.V1PodSpec:
-        """
-        Make the specification for a pod that can execute the given job.
+    def _create_volumes(self) -> Tuple[List[kubernetes.client.V1Volume], List[kubernetes.client.V1VolumeMount]]:
         """
+        Make the volumes, and the mounts for them, that every job's pod needs.
 
-        environment = self.environment.copy()
-        if job_environment:
-            environment.update(job_environment)
-
-        # Make a command to run it in the executor
-        command_list = pack_job(job_desc, self.user_script, environment=environment)
-
-        # The Kubernetes API makes sense only in terms of the YAML format. Objects
-        # represent sections of the YAML files. Except from our point of view, all
-        # the internal nodes in the YAML structure are named and typed.
-
-        # For docs, start at the root of the job hierarchy:
-        # https://github.com/kubernetes-client/python/blob/master/kubernetes/docs/V1Job.md
-
-        # Make a definition for the container's resource requirements.
-        # Add on a bit for Kubernetes overhead (Toil worker's memory, hot deployed
-        # user scripts).
-        # Kubernetes needs some lower limit of memory to run the pod at all without
-        # OOMing. We also want to provision some extra space so that when
-        # we test _isPodStuckOOM we never get True unless the job has
-        # exceeded job_desc.memory.
-        requirements_dict = {'cpu': job_desc.cores,
-                             'memory': job_desc.memory + 1024 * 1024 * 512,
-                             'ephemeral-storage': job_desc.disk + 1024 * 1024 * 512}
-        # Use the requirements as the limits, for predictable behavior, and because
-        # the UCSC Kubernetes admins want it that way.
-        limits_dict = requirements_dict
-        resources = kubernetes.client.V1ResourceRequirements(limits=limits_dict,
-                                                             requests=requirements_dict)
+        These only depend on our configuration, so we make them once and share
+        them between all the pod specs we make.
+        """
 
         # Collect volumes and mounts
         volumes = []
@@ -509,6 +1203,54 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
             secret_volume_mount = kubernetes.client.V1VolumeMount(mount_path='/root/.aws', name=secret_volume_name)
             mounts.append(secret_volume_mount)
 
+        return volumes, mounts
+
+    def _create_pod_spec(
+            self,
+            job_desc: JobDescription,
+            job_environment: Optional[Dict[str, str]] = None
+    ) -> kubernetes.client.V1PodSpec:
+        """
+        Make the specification for a pod that can execute the given job.
+        """
+
+        if job_environment:
+            environment = {**self.environment, **job_environment}
+        else:
+            # pack_job just pickles the environment right away, so we don't
+            # need our own copy of it.
+            environment = self.environment
+
+        # Make a command to run it in the executor
+        command_list = pack_job(job_desc, self.user_script, environment=environment)
+
+        # The Kubernetes API makes sense only in terms of the YAML format. Objects
+        # represent sections of the YAML files. Except from our point of view, all
+        # the internal nodes in the YAML structure are named and typed.
+
+        # For docs, start at the root of the job hierarchy:
+        # https://github.com/kubernetes-client/python/blob/master/kubernetes/docs/V1Job.md
+
+        # Make a definition for the container's resource requirements.
+        # Add on a bit for Kubernetes overhead (Toil worker's memory, hot deployed
+        # user scripts).
+        # Kubernetes needs some lower limit of memory to run the pod at all without
+        # OOMing. We also want to provision some extra space so that when
+        # we test _isPodStuckOOM we never get True unless the job has
+        # exceeded job_desc.memory.
+        requirements_dict = {'cpu': job_desc.cores,
+                             'memory': job_desc.memory + 1024 * 1024 * 512,
+                             'ephemeral-storage': job_desc.disk + 1024 * 1024 * 512}
+        # Use the requirements as the limits, for predictable behavior, and because
+        # the UCSC Kubernetes admins want it that way.
+        limits_dict = requirements_dict
+        resources = kubernetes.client.V1ResourceRequirements(limits=limits_dict,
+                                                             requests=requirements_dict)
+
+        # The volumes and mounts are the same for every job, so we share them
+        volumes = self._volumes
+        mounts = self._mounts
+
         # Make a container definition
         container = kubernetes.client.V1Container(command=command_list,
                                                   image=self.docker_image,
@@ -549,13 +1291,14 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
             # Make a batch system scope job ID
             jobID = self.getNextJobID()
             # Make a unique name
-            jobName = self.job_prefix + str(jobID)
+            jobName = f"{self.job_prefix}{jobID}"
 
-            # Make metadata to label the job/pod with info.
-            # Don't let the cluster autoscaler evict any Toil jobs.
-            metadata = kubernetes.client.V1ObjectMeta(name=jobName,
-                                                      labels={"toil_run": self.run_id},
-                                                      annotations={"cluster-autoscaler.kubernetes.io/safe-to-evict": "false"})
+            # Make metadata to label the job/pod with info, from our template.
+            # The annotations are shared, but nobody changes them.
+            metadata = copy.copy(self._job_metadata_template)
+            metadata.name = jobName
+            # Also label it with its ID, so we can delete jobs in bulk.
+            metadata.labels = {**self._job_metadata_template.labels, "toil_job": str(jobID)}
 
             # Wrap the spec in a template
             template = kubernetes.client.V1PodTemplateSpec(spec=pod_spec, metadata=metadata)
@@ -573,89 +1316,83 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
                                           api_version="batch/v1",
                                           kind="Job")
 
-            # Make the job
-            launched = self._try_kubernetes(self._api('batch').create_namespaced_job, self.namespace, job)
+            # Remember it right away, so it counts as issued even before
+            # Kubernetes has it.
+            self._job_informer.put(job)
 
-            logger.debug('Launched job: %s', jobName)
+            # Make the job. This can take a while, and the leader issues jobs
+            # one at a time, so do it in the background so that the creation
+            # requests for a lot of jobs can overlap.
+            future = self._creation_pool.submit(self._create_job, jobID, job)
+            self._creations[jobName] = future
+            future.add_done_callback(lambda _: self._creations.pop(jobName, None))
 
             return jobID
 
-    def _ourJobObject(self, onlySucceeded=False):
+    def _create_job(self, jobID: int, job: kubernetes.client.V1Job) -> None:
         """
-        Yield Kubernetes V1Job objects that we are responsible for that the
-        cluster knows about.
-
-        Doesn't support a free-form selector, because there's only about 3
-        things jobs can be selected on: https://stackoverflow.com/a/55808444
+        Create the given job in Kubernetes. Runs in the job creation pool.
 
-        :param bool onlySucceeded: restrict results to succeeded jobs.
-        :param int limit: max results to yield.
+        If the job can't be created, it is reported as failed by
+        getUpdatedBatchJob().
         """
+        jobName = job.metadata.name
+        try:
+            launched = self._try_kubernetes(self.batch_api.create_namespaced_job, self.namespace, job)
+        except Exception as e:
+            logger.error('Could not create Kubernetes job %s: %s', jobName, e)
+            self._job_informer.forget(jobName)
+            self._failed_creations.put(jobID)
+            self._cluster_changed.set()
+        else:
+            # Remember what Kubernetes made, instead of waiting to hear about it
+            self._job_informer.put(launched)
+            logger.debug('Launched job: %s', jobName)
 
-        # We need to page through the list from the cluster with a continuation
-        # token. These expire after about 5 minutes. If we use an expired one,
-        # we get a 410 error and a new token, and we can use the new token to
-        # get the rest of the list, but the list will be updated.
-        #
-        # TODO: How to get the new token isn't clear. See
-        # https://github.com/kubernetes-client/python/issues/953. For now we
-        # will just throw an error if we don't get to the end of the list in
-        # time.
-
-        token = None
-
-        while True:
-            # We can't just pass e.g. a None continue token when there isn't
-            # one, because the Kubernetes module reads its kwargs dict and
-            # cares about presence/absence. So we build a dict to send.
-            kwargs = {}
+    def _wait_for_creations(self, jobNames: List[str]) -> None:
+        """
+        Block until any creation requests in progress for the jobs with the
+        given names are done, so they can't make jobs appear after we have
+        tried to delete them.
+        """
+        futures = [f for f in (self._creations.get(name) for name in jobNames) if f is not None]
+        concurrent.futures.wait(futures)
 
-            if token is not None:
-                kwargs['_continue'] = token
+    def _ourJobObject(self, onlySucceeded=False, onlyUnfinished=False):
+        """
+        Yield Kubernetes V1Job objects that we are responsible for that the
+        cluster knows about.
 
-            if onlySucceeded:
-                results =  self._try_kubernetes(self._api('batch').list_namespaced_job, self.namespace,
-                                                label_selector=f"toil_run={self.run_id}", field_selector="status.successful==1", **kwargs)
-            else:
-                results = self._try_kubernetes(self._api('batch').list_namespaced_job, self.namespace,
-                                                label_selector=f"toil_run={self.run_id}", **kwargs)
-            yield from results.items  # These jobs belong to us
+        Reads from our watch-driven cache of jobs, so it doesn't need to talk
+        to the cluster.
 
-            # Remember the continuation token, if any
-            token = getattr(results.metadata, 'continue', None)
+        :param bool onlySucceeded: restrict results to succeeded jobs.
+        :param bool onlyUnfinished: restrict results to jobs that have neither
+               succeeded nor failed yet.
+        """
 
-            if token is None:
-                # There isn't one. We got everything.
-                break
+        if not onlySucceeded and not onlyUnfinished:
+            yield from self._job_informer.values()
+            return
 
+        # Pick out the jobs we want by their summaries.
+        for job, summary in self._job_informer.summarized_values():
+            if onlySucceeded and summary.succeeded == 0:
+                continue
+            if onlyUnfinished and (summary.succeeded > 0 or summary.failed > 0):
+                continue
+            yield job
 
     def _ourPodObject(self):
         """
         Yield Kubernetes V1Pod objects that we are responsible for that the
         cluster knows about.
-        """
-
-        token = None
-
-        while True:
-            # We can't just pass e.g. a None continue token when there isn't
-            # one, because the Kubernetes module reads its kwargs dict and
-            # cares about presence/absence. So we build a dict to send.
-            kwargs = {}
-
-            if token is not None:
-                kwargs['_continue'] = token
 
-            results = self._try_kubernetes(self._api('core').list_namespaced_pod, self.namespace, label_selector=f"toil_run={self.run_id}", **kwargs)
-
-            yield from results.items
-            # Remember the continuation token, if any
-            token = getattr(results.metadata, 'continue', None)
-
-            if token is None:
-                # There isn't one. We got everything.
-                break
+        Reads from our watch-driven cache of pods, so it doesn't need to talk
+        to the cluster.
+        """
 
+        yield from self._pod_informer.values()
 
     def _getPodForJob(self, jobObject):
         """
@@ -669,35 +1406,50 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
         :rtype: kubernetes.client.V1Pod
         """
 
-        token = None
+        # Kubernetes labels the pods with `job-name=JOBNAME`, and our pod
+        # cache is indexed on that label.
+        return self._pod_informer.get_by_label(jobObject.metadata.name)
 
-        # Work out what the return code was (which we need to get from the
-        # pods) We get the associated pods by querying on the label selector
-        # `job-name=JOBNAME`
-        query = f'job-name={jobObject.metadata.name}'
+    def _getFinishedPodForJob(self, jobObject):
+        """
+        Get the pod that belongs to the given finished job, or None if the
+        job's pod is missing, making sure we know how the pod's container
+        stopped if Kubernetes does.
 
-        while True:
-            # We can't just pass e.g. a None continue token when there isn't
-            # one, because the Kubernetes module reads its kwargs dict and
-            # cares about presence/absence. So we build a dict to send.
-            kwargs = {'label_selector': query}
-            if token is not None:
-                kwargs['_continue'] = token
-            results = self._try_kubernetes(self._api('core').list_namespaced_pod, self.namespace, **kwargs)
-
-            for pod in results.items:
-                # Return the first pod we find
-                return pod
-
-            # Remember the continuation token, if any
-            token = getattr(results.metadata, 'continue', None)
-
-            if token is None:
-                # There isn't one. We got everything.
-                break
+        Our job and pod caches are kept up to date by separate watches, so we
+        can hear that a job finished before we hear what happened to its pod.
+        If the cached pod doesn't have a terminated container yet, or isn't
+        cached at all, we ask the cluster for the pod instead.
+
+        :param kubernetes.client.V1Job jobObject: a finished Kubernetes job to
+                                       look up pods for.
 
-        # If we get here, no pages had any pods.
-        return None
+        :rtype: kubernetes.client.V1Pod
+        """
+
+        pod = self._getPodForJob(jobObject)
+        if pod is not None and pod.status is not None and pod.status.container_statuses and \
+                getattr(pod.status.container_statuses[0].state, 'terminated', None) is not None:
+            # The cache already knows how the pod ended.
+            return pod
+
+        fresh = None
+        if pod is not None:
+            try:
+                fresh = self._try_kubernetes_expecting_gone(self.core_api.read_namespaced_pod,
+                                                            pod.metadata.name, self.namespace)
+            except ApiException as e:
+                if e.status != 404:
+                    raise
+        if fresh is None:
+            # We don't know the pod's name, or it has a new one. Kubernetes
+            # labels the pods with the job's name.
+            pods = self._try_kubernetes(self.core_api.list_namespaced_pod, self.namespace,
+                                        label_selector=f"job-name={jobObject.metadata.name}").items
+            fresh = pods[0] if pods else None
+        # If the cluster doesn't have the pod anymore, what we had is the best
+        # we can do.
+        return fresh if fresh is not None else pod
 
     def _getLogForPod(self, podObject):
         """
@@ -711,8 +1463,81 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
 
         """
 
-        return self._try_kubernetes(self._api('core').read_namespaced_pod_log, podObject.metadata.name,
-                                                         namespace=self.namespace)
+        # Once a pod has stopped, its log can't change, so we can remember it.
+        finished = getattr(podObject.status, 'phase', None) in ('Succeeded', 'Failed')
+        uid = podObject.metadata.uid
+        if finished and uid in self._finished_pod_logs:
+            self._finished_pod_logs.move_to_end(uid)
+            return self._finished_pod_logs[uid]
+
+        log = self._try_kubernetes(self.core_api.read_namespaced_pod_log, podObject.metadata.name,
+                                                        namespace=self.namespace)
+        if finished and uid is not None:
+            self._finished_pod_logs[uid] = log
+            while len(self._finished_pod_logs) > self.finished_pod_log_cache_size:
+                # Forget the least recently used log
+                self._finished_pod_logs.popitem(last=False)
+        return log
+
+    def _poll_all_pod_memory(self) -> Dict[str, int]:
+        """
+        Get the memory usage in bytes of each of our pods' (first) containers,
+        by pod name.
+
+        Asks the metrics service about all our pods in one request, and then
+        reuses the answer for pod_memory_poll_interval seconds, so checking
+        a lot of pods is just dict lookups.
+
+        Pods the metrics service doesn't know about, or that have no
+        containers yet, are left out. If the metrics service is not working,
+        nothing is returned.
+        """
+        now = time.monotonic()
+        if self._pod_memory_time is not None and now - self._pod_memory_time < self.pod_memory_poll_interval:
+            return self._pod_memory
+
+        try:
+            # TODO: When the Kubernetes Python API actually wraps the metrics API, switch to that
+            # Decode the JSON ourselves; we don't need the Kubernetes module's
+            # deserialization machinery to get a dict.
+            raw_response = self.custom_api.list_namespaced_custom_object('metrics.k8s.io', 'v1beta1',
+                                                                         self.namespace, 'pods',
+                                                                         label_selector=self._run_label_selector,
+                                                                         _preload_content=False)
+            response = json.loads(raw_response.data)
+            raw_response.release_conn()
+        except Exception as e:
+            # We couldn't talk to the metrics service on this attempt. We don't
+            # retry, but we also don't want to just ignore all errors. We only
+            # want to ignore errors we expect to see if the problem is that the
+            # metrics service is not working.
+            if isinstance(e, retryable_kubernetes_error_types):
+                # This is the sort of error we would expect from an overloaded
+                # Kubernetes or a dead metrics service.
+                # We can't tell that any pod is stuck, so say that none are,
+                # and don't ask again until the next poll.
+                logger.warning("Could not query metrics service: %s", e)
+                self._pod_memory = {}
+                self._pod_memory_time = now
+                return self._pod_memory
+            else:
+                raise
+
+        usage = {}
+        for item in response.get('items', []):
+            name = item.get('metadata', {}).get('name')
+            # Assume it has exactly one container, because we made it
+            containers = item.get('containers', [])
+            if name is None or len(containers) == 0:
+                # If there are no containers (because none have started yet?), we can't say it's stuck OOM
+                continue
+            # Grab the memory usage string, like 123Ki, and convert to bytes.
+            # If anything is missing, assume 0 bytes used.
+            usage[name] = human2bytes(containers[0].get('usage', {}).get('memory', '0'))
+
+        self._pod_memory = usage
+        self._pod_memory_time = now
+        return usage
 
     def _isPodStuckOOM(self, podObject, minFreeBytes=1024 * 1024 * 2):
         """
@@ -740,51 +1565,27 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
         :rtype: bool
         """
 
-        # Compose a query to get just the pod we care about
-        query = 'metadata.name=' + podObject.metadata.name
-
-        # Look for it, but manage our own exceptions
-        try:
-            # TODO: When the Kubernetes Python API actually wraps the metrics API, switch to that
-            response = self._api('customObjects').list_namespaced_custom_object('metrics.k8s.io', 'v1beta1',
-                                                                                self.namespace, 'pods',
-                                                                                field_selector=query)
-        except Exception as e:
-            # We couldn't talk to the metrics service on this attempt. We don't
-            # retry, but we also don't want to just ignore all errors. We only
-            # want to ignore errors we expect to see if the problem is that the
-            # metrics service is not working.
-            if type(e) in retryable_kubernetes_errors:
-                # This is the sort of error we would expect from an overloaded
-                # Kubernetes or a dead metrics service.
-                # We can't tell that the pod is stuck, so say that it isn't.
-                logger.warning("Could not query metrics service: %s", e)
-                return False
-            else:
-                raise
-
-        # Pull out the items
-        items = response.get('items', [])
-
-        if len(items) == 0:
-            # If there's no statistics we can't say we're stuck OOM
+        if podObject.status is None or podObject.status.phase != 'Running':
+            # Only running pods can be using memory
             return False
 
-        # Assume the first result is the right one, because of the selector
-        # Assume it has exactly one pod, because we made it
-        containers = items[0].get('containers', [{}])
-
-        if len(containers) == 0:
-            # If there are no containers (because none have started yet?), we can't say we're stuck OOM
+        # Get the limit out of the pod object's spec first, since we don't
+        # have to ask the cluster for it.
+        limits = podObject.spec.containers[0].resources.limits or {}
+        if 'memory' not in limits:
+            # Without a limit, we can't be stuck up against it.
+            return False
+        bytesAllowed = memory_quantity_to_bytes(limits['memory'])
+        if bytesAllowed <= minFreeBytes:
+            # The pod never had enough room to count; don't call it stuck.
             return False
 
-        # Otherwise, assume it just has one container.
-        # Grab the memory usage string, like 123Ki, and convert to bytes.
-        # If anything is missing, assume 0 bytes used.
-        bytesUsed = human2bytes(containers[0].get('usage', {}).get('memory', '0'))
+        # Get the memory usage of all our pods, which we poll all at once
+        bytesUsed = self._poll_all_pod_memory().get(podObject.metadata.name)
 
-        # Also get the limit out of the pod object's spec
-        bytesAllowed = human2bytes(podObject.spec.containers[0].resources.limits['memory'])
+        if bytesUsed is None:
+            # If there's no statistics we can't say we're stuck OOM
+            return False
 
         if bytesAllowed - bytesUsed < minFreeBytes:
             # This is too much!
@@ -806,13 +1607,13 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
         :rtype: int
         """
 
-        return int(jobObject.metadata.name[len(self.job_prefix):])
+        return int(jobObject.metadata.name[self._job_prefix_length:])
 
 
     def getUpdatedBatchJob(self, maxWait):
 
-        entry = datetime.datetime.now()
-
+        # Anything that has already happened will be seen by this first look.
+        self._cluster_changed.clear()
         result = self._getUpdatedBatchJobImmediately()
 
         if result is not None or maxWait == 0:
@@ -821,73 +1622,107 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
 
         # Otherwise we need to maybe wait.
         if self.enable_watching:
-            for event in self._try_kubernetes_stream(self._api('batch').list_namespaced_job, self.namespace,
-                                                        label_selector=f"toil_run={self.run_id}",
+            for event in self._try_kubernetes_stream(self.batch_api.list_namespaced_job, self.namespace,
+                                                        label_selector=self._run_label_selector,
                                                         timeout_seconds=maxWait):
-                # Grab the metadata data, ID, the list of conditions of the current job, and the total pods
                 jobObject = event['object']
-                jobID = int(jobObject.metadata.name[len(self.job_prefix):])
-                jobObjectListConditions =jobObject.status.conditions
-                totalPods = jobObject.status.active + jobObject.status.finished + jobObject.status.failed
-                # Exit Reason defaults to 'Successfully Finished` unless said otherwise
-                exitReason = BatchJobExitReason.FINISHED
-                exitCode = 0
-
-                # Check if there are any active pods
-                if jobObject.status.acitve > 0:
-                    logger.info("%s has %d pods running" % jobObject.metadata.name, jobObject.status.active)
-                    continue
-                elif jobObject.status.failed > 0 or jobObject.status.finished > 0:
-                    # No more active pods in the current job ; must be finished
-                    logger.info("%s RESULTS -> Succeeded: %d Failed:%d Active:%d" % jobObject.metadata.name,
-                                                                jobObject.status.succeeded, jobObject.status.failed, jobObject.status.active)
-                    # Get termination information of job
-                    termination = jobObjectListConditions[0]
-                    # Log out success/failure given a reason
-                    logger.info("%s REASON: %s", termination.type, termination.reason)
-
-                    # Log out reason of failure and pod exit code
-                    if jobObject.status.failed > 0:
-                        exitReason = BatchJobExitReason.FAILED
-                        pod = self._getPodForJob(jobObject)
-                        logger.debug("Failed job %s", self._pretty_print(jobObject))
-                        logger.warning("Failed Job Message: %s", termination.message)
-                        exitCode = pod.status.container_statuses[0].state.terminated.exit_code
-
-                    runtime = slow_down((termination.completion_time - termination.start_time).total_seconds())
-                    result = UpdatedBatchJobInfo(jobID=jobID, exitStatus=exitCode, wallTime=runtime, exitReason=exitReason)
-
-                    if (exitReason == BatchJobExitReason.FAILED) or (jobObject.status.finished == totalPods):
-                        # Cleanup if job is all finished or there was a pod that failed
-                        logger.debug('Deleting Kubernetes job %s', jobObject.metadata.name)
-                        self._try_kubernetes(self._api('batch').delete_namespaced_job,
-                                            jobObject.metadata.name,
-                                            self.namespace,
-                                            propagation_policy='Foreground')
-                        self._waitForJobDeath(jobObject.metadata.name)
-                        return result
-                    continue
-                else:
-                    # Job is not running/updating ; no active, successful, or failed pods yet
-                    logger.debug("Job {} -> {}".format(jobObject.metadata.name, jobObjectListConditions[0].reason))
-                    # Pod could be pending; don't say it's lost.
-                    continue
+                result = self._getUpdatedBatchJobFromWatchedJob(jobObject)
+                if result is not None:
+                    # Cleanup if job is all finished or there was a pod that failed
+                    self._finish_job(jobObject.metadata.name)
+                    return result
         else:
-            # Try polling instead
-            while result is None and (datetime.datetime.now() - entry).total_seconds() < maxWait:
-                # We still have nothing and we haven't hit the timeout.
-
-                # Poll
+            # Wait for our caches to hear about something happening, instead
+            # of polling Kubernetes.
+            deadline = time.monotonic() + maxWait
+            while result is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # We hit the timeout.
+                    break
+                # Local jobs and stuck pods don't make our caches change, so
+                # we still need to look every so often.
+                pollInterval = 1.0 if self.getIssuedLocalJobIDs() else self.pod_memory_poll_interval
+                self._cluster_changed.wait(min(remaining, pollInterval))
+                # Clear the event before looking, so anything that happens
+                # after we look wakes us up next time.
+                self._cluster_changed.clear()
                 result = self._getUpdatedBatchJobImmediately()
 
-                if result is None:
-                    # Still nothing. Wait a second, or some fraction of our max wait time.
-                    time.sleep(min(maxWait/2, 1.0))
-
             # When we get here, either we found something or we ran out of time
             return result
 
 
+    def _getUpdatedBatchJobFromWatchedJob(self, jobObject: kubernetes.client.V1Job) -> Optional[UpdatedBatchJobInfo]:
+        """
+        Look at a job we heard about from a watch, and work out if it is done.
+
+        :return: The update to report for the job if it is finished and
+                 should be cleaned up, or None otherwise.
+        """
+        if self._job_informer.get(jobObject.metadata.name) is None:
+            # We already dealt with this job (or never had it), so this is old
+            # news.
+            return None
+
+        # Grab the ID, the list of conditions of the current job, and the pod counts.
+        # Kubernetes leaves out counts that are 0.
+        jobID = int(jobObject.metadata.name[self._job_prefix_length:])
+        jobObjectListConditions = jobObject.status.conditions or []
+        active = jobObject.status.active or 0
+        succeeded = jobObject.status.succeeded or 0
+        failed = jobObject.status.failed or 0
+        totalPods = active + succeeded + failed
+        # Exit Reason defaults to 'Successfully Finished` unless said otherwise
+        exitReason = BatchJobExitReason.FINISHED
+        exitCode = 0
+
+        # Check if there are any active pods
+        if active > 0:
+            logger.info("%s has %d pods running", jobObject.metadata.name, active)
+            return None
+        elif failed > 0 or succeeded > 0:
+            # No more active pods in the current job ; must be finished
+            logger.info("%s RESULTS -> Succeeded: %d Failed:%d Active:%d", jobObject.metadata.name,
+                        succeeded, failed, active)
+            if len(jobObjectListConditions) > 0:
+                # Get termination information of job
+                termination = jobObjectListConditions[0]
+                # Log out success/failure given a reason
+                logger.info("%s REASON: %s", termination.type, termination.reason)
+            else:
+                termination = None
+
+            # Log out reason of failure and pod exit code
+            if failed > 0:
+                exitReason = BatchJobExitReason.FAILED
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Failed job %s", self._pretty_print(jobObject))
+                if termination is not None:
+                    logger.warning("Failed Job Message: %s", termination.message)
+                pod = self._getFinishedPodForJob(jobObject)
+                terminatedInfo = None
+                if pod is not None and pod.status.container_statuses:
+                    terminatedInfo = getattr(pod.status.container_statuses[0].state, 'terminated', None)
+                exitCode = terminatedInfo.exit_code if terminatedInfo is not None else EXIT_STATUS_UNAVAILABLE_VALUE
+
+            # Conditions don't have times on them, but the job does. It only
+            # gets a completion time if it succeeds, though.
+            now = utc_now()
+            startTime = jobObject.status.start_time or now
+            completionTime = jobObject.status.completion_time or now
+            runtime = slow_down((completionTime - startTime).total_seconds())
+
+            if exitReason == BatchJobExitReason.FAILED or succeeded == totalPods:
+                return UpdatedBatchJobInfo(jobID=jobID, exitStatus=exitCode, wallTime=runtime, exitReason=exitReason)
+            return None
+        else:
+            # Job is not running/updating ; no active, successful, or failed pods yet
+            if len(jobObjectListConditions) > 0:
+                logger.debug("Job %s -> %s", jobObject.metadata.name, jobObjectListConditions[0].reason)
+            # Pod could be pending; don't say it's lost.
+            return None
+
     def _getUpdatedBatchJobImmediately(self):
         """
         Return None if no updated (completed or failed) batch job is currently
@@ -902,6 +1737,14 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
 
         # Otherwise we didn't get a local job.
 
+        try:
+            # If we couldn't even create a job, it failed.
+            jobID = self._failed_creations.get_nowait()
+            return UpdatedBatchJobInfo(jobID=jobID, exitStatus=EXIT_STATUS_UNAVAILABLE_VALUE, wallTime=0,
+                                       exitReason=BatchJobExitReason.ERROR)
+        except Empty:
+            pass
+
         # Go looking for other jobs
 
         # Everybody else does this with a queue and some other thread that
@@ -912,29 +1755,34 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
         jobObject = None
         # Put 'done', 'failed', or 'stuck' here
         chosenFor = ''
+        # If we already looked up the job's pod, put it here
+        chosenPod = None
+
+        # Sort our jobs by what has happened to them, in one pass over one
+        # snapshot of the cache.
+        failedJob = None
+        unfinishedJobs = []
+        for j, summary in self._job_informer.summarized_values():
+            if summary.succeeded > 0:
+                # Take any succeeded job first
+                jobObject = j
+                chosenFor = 'done'
+                break
+            elif summary.failed > 0:
+                # Otherwise, we want the first failed one we find
+                if failedJob is None:
+                    failedJob = j
+            else:
+                unfinishedJobs.append(j)
 
-        for j in self._ourJobObject(onlySucceeded=True):
-            # Look for succeeded jobs because that's the only filter Kubernetes has
-            jobObject = j
-            chosenFor = 'done'
-
-        if jobObject is None:
-            for j in self._ourJobObject():
-                # If there aren't any succeeded jobs, scan all jobs
-                # See how many times each failed
-                failCount = getattr(j.status, 'failed', 0)
-                if failCount is None:
-                    # Make sure it is an int
-                    failCount = 0
-                if failCount > 0:
-                    # Take the first failed one you find
-                    jobObject = j
-                    chosenFor = 'failed'
-                    break
+        if jobObject is None and failedJob is not None:
+            jobObject = failedJob
+            chosenFor = 'failed'
 
         if jobObject is None:
-            # If no jobs are failed, look for jobs with pods that are stuck for various reasons.
-            for j in self._ourJobObject():
+            # If no jobs are failed, look for jobs with pods that are stuck for
+            # various reasons. Only jobs that haven't finished can be stuck.
+            for j in unfinishedJobs:
                 pod = self._getPodForJob(j)
 
                 if pod is None:
@@ -960,6 +1808,7 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
                     # See https://github.com/kubernetes/kubernetes/issues/58384
                     jobObject = j
                     chosenFor = 'stuck'
+                    chosenPod = pod
                     logger.warning('Failing stuck job; did you try to run a non-existent Docker image?'
                                    ' Check TOIL_APPLIANCE_SELF.')
                     break
@@ -972,6 +1821,7 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
                     # Polling function takes care of the logging.
                     jobObject = j
                     chosenFor = 'stuck'
+                    chosenPod = pod
                     break
 
         if jobObject is None:
@@ -985,17 +1835,26 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
         # Otherwise we got something.
 
         # Work out what the job's ID was (whatever came after our name prefix)
-        jobID = int(jobObject.metadata.name[len(self.job_prefix):])
+        jobID = int(jobObject.metadata.name[self._job_prefix_length:])
+
+        # Times without a better source count as now. Only look at the clock
+        # once.
+        now = utc_now()
 
         # Work out when the job was submitted. If the pod fails before actually
         # running, this is the basis for our runtime.
         jobSubmitTime = getattr(jobObject.status, 'start_time', None)
         if jobSubmitTime is None:
             # If somehow this is unset, say it was just now.
-            jobSubmitTime = utc_now()
+            jobSubmitTime = now
 
-        # Grab the pod
-        pod = self._getPodForJob(jobObject)
+        # Grab the pod, if we don't have it already
+        if chosenPod is not None:
+            pod = chosenPod
+        elif chosenFor == 'done' or chosenFor == 'failed':
+            pod = self._getFinishedPodForJob(jobObject)
+        else:
+            pod = self._getPodForJob(jobObject)
 
         if pod is not None:
             if chosenFor == 'done' or chosenFor == 'failed':
@@ -1021,7 +1880,7 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
                     exitCode = EXIT_STATUS_UNAVAILABLE_VALUE
                     # Say it stopped now and started when it was scheduled/submitted.
                     # We still need a strictly positive runtime.
-                    runtime = slow_down((utc_now() - startTime).total_seconds())
+                    runtime = slow_down((now - startTime).total_seconds())
                 else:
                     # Get the termination info from the pod's main (only) container
                     terminatedInfo = getattr(getattr(containerStatuses[0], 'state', None), 'terminated', None)
@@ -1031,7 +1890,7 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
                         exitCode = EXIT_STATUS_UNAVAILABLE_VALUE
                         # Say it stopped now and started when it was scheduled/submitted.
                         # We still need a strictly positive runtime.
-                        runtime = slow_down((utc_now() - startTime).total_seconds())
+                        runtime = slow_down((now - startTime).total_seconds())
                     else:
                         # Extract the exit code
                         exitCode = terminatedInfo.exit_code
@@ -1058,78 +1917,225 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
                 # Synthesize an exit code
                 exitCode = EXIT_STATUS_UNAVAILABLE_VALUE
                 # Say it ran from when the job was submitted to when the pod got stuck
-                runtime = slow_down((utc_now() - jobSubmitTime).total_seconds())
+                runtime = slow_down((now - jobSubmitTime).total_seconds())
         else:
             # The pod went away from under the job.
             logging.warning('Exit code and runtime unavailable; pod vanished')
             exitCode = EXIT_STATUS_UNAVAILABLE_VALUE
             # Say it ran from when the job was submitted to when the pod vanished
-            runtime = slow_down((utc_now() - jobSubmitTime).total_seconds())
+            runtime = slow_down((now - jobSubmitTime).total_seconds())
 
 
-        try:
-            # Delete the job and all dependents (pods), hoping to get a 404 if it's magically gone
-            logger.debug('Deleting Kubernetes job %s', jobObject.metadata.name)
-            self._try_kubernetes_expecting_gone(self._api('batch').delete_namespaced_job, jobObject.metadata.name,
-                                                self.namespace,
-                                                propagation_policy='Foreground')
-
-            # That just kicks off the deletion process. Foreground doesn't
-            # actually block. See
-            # https://kubernetes.io/docs/concepts/workloads/controllers/garbage-collection/#foreground-cascading-deletion
-            # We have to either wait until the deletion is done and we can't
-            # see the job anymore, or ban the job from being "updated" again if
-            # we see it. If we don't block on deletion, we can't use limit=1
-            # on our query for succeeded jobs. So we poll for the job's
-            # non-existence.
-            self._waitForJobDeath(jobObject.metadata.name)
-
-        except ApiException as e:
-            if e.status != 404:
-                # Something is wrong, other than the job already being deleted.
-                raise
-            # Otherwise everything is fine and the job is gone.
+        # We are done with the job.
+        self._finish_job(jobObject.metadata.name)
 
         # Return the one finished job we found
         return UpdatedBatchJobInfo(jobID=jobID, exitStatus=exitCode, wallTime=runtime, exitReason=None)
 
+    def _finish_job(self, jobName: str) -> None:
+        """
+        Get rid of a job we have reported the result of.
+
+        Drops it from our cache so we never report it again, and deletes it
+        and all dependents (pods) in the background. We don't need to wait
+        for it to actually go away.
+        """
+        self._job_informer.forget(jobName)
+        self._deletion_queue.put(jobName)
+
+    def _delete_finished_jobs(self) -> None:
+        """
+        Main loop of the thread that deletes jobs we are done with from the
+        cluster.
+        """
+        while True:
+            jobName = self._deletion_queue.get()
+            if jobName is None:
+                # We are shutting down.
+                return
+            try:
+                logger.debug('Deleting Kubernetes job %s', jobName)
+                self._try_kubernetes_expecting_gone(self.batch_api.delete_namespaced_job, jobName,
+                                                    self.namespace,
+                                                    propagation_policy='Background')
+            except ApiException as e:
+                if e.status != 404:
+                    # If we can't delete it, the TTL will get it eventually.
+                    logger.warning('Could not delete Kubernetes job %s: %s', jobName, e)
+            except Exception as e:
+                # Don't let the deleting thread die.
+                logger.warning('Could not delete Kubernetes job %s: %s', jobName, e)
+
     def _waitForJobDeath(self, jobName):
         """
         Block until the job with the given name no longer exists.
         """
 
-        # We do some exponential backoff on the polling
-        # TODO: use a wait instead of polling?
-        backoffTime = 0.1
-        maxBackoffTime = 6.4
+        self._wait_for_gone(self.batch_api.read_namespaced_job, self.batch_api.list_namespaced_job, jobName)
+        # Make sure we don't see it in our cache anymore, even if the watch
+        # hasn't told us it is gone yet.
+        self._job_informer.forget(jobName)
+
+    def _back_off_after_watch(self, watch_start: float, backoff: float,
+                              watch_timeout: Optional[float] = None) -> float:
+        """
+        Decide how long to wait before checking on objects again after a watch
+        ended without telling us what we wanted, and wait that long.
+
+        If the watch lasted as long as we asked, we start over right away. If
+        it ended early, Kubernetes is probably having trouble, so we back off
+        exponentially, up to the configured maximum poll interval. We add
+        jitter so that lots of waits don't all come back at once.
+
+        :param watch_start: time.monotonic() when the watch started.
+        :param backoff: How long we waited last time, in seconds.
+        :param watch_timeout: How long the watch was asked to last, in
+               seconds. Defaults to deletion_watch_timeout.
+        :return: The backoff to use for next time.
+        """
+        if watch_timeout is None:
+            watch_timeout = self.deletion_watch_timeout
+        if time.monotonic() - watch_start >= watch_timeout:
+            # The watch just timed out; nothing is wrong.
+            return self.min_poll_interval
+        # Use "decorrelated jitter" to pick a new, longer wait.
+        backoff = min(self.poll_max_interval, random.uniform(self.min_poll_interval, backoff * 3))
+        time.sleep(backoff)
+        return backoff
+
+    def _selector_for_jobs(self, jobIDs: Iterable[int]) -> str:
+        """
+        Get a label selector for just the jobs with the given IDs.
+        """
+        return f"{self._run_label_selector},toil_job in ({','.join(str(jobID) for jobID in jobIDs)})"
+
+    def _waitForJobsDeath(self, jobNames: List[str]) -> None:
+        """
+        Block until none of the jobs with the given names exist anymore.
+
+        Uses one watch on all our jobs, instead of waiting for each job in
+        turn.
+        """
+
+        pending = set(jobNames)
+        backoff = self.min_poll_interval
+        while pending:
+            if len(pending) <= self.kill_collection_size:
+                # Only look at the jobs we are waiting for, so we get less
+                # back from Kubernetes.
+                selector = self._selector_for_jobs(int(name[self._job_prefix_length:]) for name in pending)
+            else:
+                selector = self._run_label_selector
+
+            # See which of the jobs are still around, and what version of the
+            # job list to watch from. We only need names, so don't bother
+            # making API objects.
+            response = self._try_kubernetes(self.batch_api.list_namespaced_job, self.namespace,
+                                            label_selector=selector,
+                                            limit=KubernetesInformer.list_page_size,
+                                            _preload_content=False)
+            listing = json.loads(response.data)
+            response.release_conn()
+            stillThere = {item['metadata']['name'] for item in listing.get('items', [])}
+            while listing['metadata'].get('continue'):
+                # Get the rest of the pages
+                response = self._try_kubernetes(self.batch_api.list_namespaced_job, self.namespace,
+                                                label_selector=selector,
+                                                limit=KubernetesInformer.list_page_size,
+                                                _continue=listing['metadata']['continue'],
+                                                _preload_content=False)
+                listing = json.loads(response.data)
+                response.release_conn()
+                stillThere.update(item['metadata']['name'] for item in listing.get('items', []))
+            pending.intersection_update(stillThere)
+            if not pending:
+                break
+
+            watch_start = time.monotonic()
+            for event in self._try_kubernetes_stream(self.batch_api.list_namespaced_job, self.namespace,
+                                                     label_selector=selector,
+                                                     resource_version=listing['metadata']['resourceVersion'],
+                                                     timeout_seconds=self.deletion_watch_timeout,
+                                                     deserialize=False):
+                if event['type'] == 'DELETED':
+                    pending.discard(event['raw_object']['metadata']['name'])
+                    if not pending:
+                        break
+            if pending:
+                # If the watch ended with jobs still around (because it timed
+                # out or had an error), check on them again and start over.
+                backoff = self._back_off_after_watch(watch_start, backoff)
+
+        for jobName in jobNames:
+            # Make sure we don't see them in our cache anymore, even if the
+            # informer hasn't heard they are gone yet.
+            self._job_informer.forget(jobName)
+
+    def _wait_for_gone(self, read_method: Callable[..., Any], list_method: Callable[..., Any], name: str) -> None:
+        """
+        Block until the object with the given name in our namespace no longer
+        exists.
+
+        Instead of polling, we watch the object and wait to hear that it was
+        deleted.
+
+        :param read_method: Kubernetes API method to read the object, like
+               read_namespaced_job.
+        :param list_method: Kubernetes API method to list objects of the same
+               kind, like list_namespaced_job.
+        :param name: Name of the object to wait for.
+        """
+        backoff = self.min_poll_interval
         while True:
             try:
-                # Look for the job
-                self._try_kubernetes_expecting_gone(self._api('batch').read_namespaced_job, jobName, self.namespace)
-                # If we didn't 404, wait a bit with exponential backoff
-                time.sleep(backoffTime)
-                if backoffTime < maxBackoffTime:
-                    backoffTime *= 2
+                # See if it is already gone, and if not, what version of it
+                # to watch from. We don't want a whole API object for this.
+                response = self._try_kubernetes_expecting_gone(read_method, name, self.namespace,
+                                                               _preload_content=False)
+                resource_version = json.loads(response.data)['metadata']['resourceVersion']
+                response.release_conn()
             except ApiException as e:
-                # We finally got a failure!
                 if e.status != 404:
-                    # But it wasn't due to the job being gone; something is wrong.
+                    # It wasn't due to the object being gone; something is wrong.
                     raise
-                # It was a 404; the job is gone. Stop polling it.
-                break
+                # It was a 404; the object is gone.
+                return
+
+            watch_start = time.monotonic()
+            for event in self._try_kubernetes_stream(list_method, self.namespace,
+                                                     field_selector=f"metadata.name={name}",
+                                                     resource_version=resource_version,
+                                                     timeout_seconds=self.deletion_watch_timeout,
+                                                     deserialize=False):
+                if event['type'] == 'DELETED':
+                    return
+            # If the watch ended without seeing the deletion (because it timed
+            # out or had an error), check on the object again and start over.
+            backoff = self._back_off_after_watch(watch_start, backoff)
 
     def shutdown(self) -> None:
 
         # Shutdown local processes first
         self.shutdownLocal()
 
+        # Finish creating any jobs we were in the middle of, so we can delete
+        # them.
+        self._creation_pool.shutdown(wait=True)
+
+        # Stop watching our jobs and pods
+        self._job_informer.stop()
+        self._pod_informer.stop()
+
+        # Stop deleting individual jobs; we are about to delete them all.
+        self._deletion_queue.put(None)
+        self._deletion_thread.join()
 
         # Kill all of our jobs and clean up pods that are associated with those jobs
         try:
             logger.debug('Deleting all Kubernetes jobs for toil_run=%s', self.run_id)
-            self._try_kubernetes_expecting_gone(self._api('batch').delete_collection_namespaced_job,
+            self._try_kubernetes_expecting_gone(self.batch_api.delete_collection_namespaced_job,
                                                             self.namespace,
-                                                            label_selector=f"toil_run={self.run_id}",
+                                                            label_selector=self._run_label_selector,
                                                             propagation_policy='Background')
             logger.debug('Killed jobs with delete_collection_namespaced_job; cleaned up')
         except ApiException as e:
@@ -1140,18 +2146,19 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
             # aggregate all pods and check if any pod has failed to cleanup or is orphaned.
             ourPods = self._ourPodObject()
 
-            for pod in ourPods:
+            def clean_up(pod: kubernetes.client.V1Pod) -> None:
                 try:
-                    if pod.status.phase == 'Failed':
-                            logger.debug('Failed pod encountered at shutdown:\n%s', self._pretty_print(pod))
-                    if pod.status.phase == 'Orphaned':
-                            logger.debug('Orphaned pod encountered at shutdown:\n%s', self._pretty_print(pod))
+                    if logger.isEnabledFor(logging.DEBUG):
+                        if pod.status.phase == 'Failed':
+                                logger.debug('Failed pod encountered at shutdown:\n%s', self._pretty_print(pod))
+                        if pod.status.phase == 'Orphaned':
+                                logger.debug('Orphaned pod encountered at shutdown:\n%s', self._pretty_print(pod))
                 except:
                     # Don't get mad if that doesn't work.
                     pass
                 try:
                     logger.debug('Cleaning up pod at shutdown: %s', pod.metadata.name)
-                    respone = self._try_kubernetes_expecting_gone(self._api('core').delete_namespaced_pod,  pod.metadata.name,
+                    respone = self._try_kubernetes_expecting_gone(self.core_api.delete_namespaced_pod,  pod.metadata.name,
                                         self.namespace,
                                         propagation_policy='Background')
                 except ApiException as e:
@@ -1159,17 +2166,16 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
                         # Anything other than a 404 is weird here.
                         logger.error("Exception when calling CoreV1Api->delete_namespaced_pod: %s" % e)
 
+            # Clean up all the pods at once.
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.job_deletion_threads) as pool:
+                list(pool.map(clean_up, ourPods))
 
     def _getIssuedNonLocalBatchJobIDs(self):
         """
         Get the issued batch job IDs that are not for local jobs.
         """
-        jobIDs = []
-        got_list = self._ourJobObject()
-        for job in got_list:
-            # Get the ID for each job
-            jobIDs.append(self._getIDForOurJob(job))
-        return jobIDs
+        # We work out the ID for each job when it goes in the cache.
+        return [summary.job_id for summary in self._job_informer.summaries().values()]
 
     def getIssuedBatchJobIDs(self):
         # Make sure to send the local jobs also
@@ -1178,7 +2184,9 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
     def getRunningBatchJobIDs(self):
         # We need a dict from jobID (integer) to seconds it has been running
         secondsPerJob = dict()
-        for job in self._ourJobObject():
+        # Measure all the jobs against the same time
+        now = utc_now()
+        for job in self._ourJobObject(onlyUnfinished=True):
             # Grab the pod for each job
             pod = self._getPodForJob(job)
 
@@ -1191,7 +2199,7 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
 
                 # The only time we have handy is when the pod got assigned to a
                 # kubelet, which is technically before it started running.
-                runtime = (utc_now() - pod.status.start_time).total_seconds()
+                runtime = (now - pod.status.start_time).total_seconds()
 
                 # Save it under the stringified job ID
                 secondsPerJob[self._getIDForOurJob(job)] = runtime
@@ -1206,34 +2214,50 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
 
         # Clears workflow's jobs listed in jobIDs.
 
+        # Make sure we aren't still creating any of them
+        self._wait_for_creations([self.job_prefix + str(jobID) for jobID in jobIDs])
+
         # First get the jobs we even issued non-locally
         issuedOnKubernetes = set(self._getIssuedNonLocalBatchJobIDs())
 
-        for jobID in jobIDs:
-            # For each job we are supposed to kill
-            if jobID not in issuedOnKubernetes:
-                # It never went to Kubernetes (or wasn't there when we just
-                # looked), so we can't kill it on Kubernetes.
-                continue
-            # Work out what the job would be named
-            jobName = self.job_prefix + str(jobID)
+        # Work out what the jobs that went to Kubernetes would be named. Any
+        # others never went to Kubernetes (or weren't there when we just
+        # looked), so we can't kill them on Kubernetes.
+        jobNames = [self.job_prefix + str(jobID) for jobID in jobIDs if jobID in issuedOnKubernetes]
 
+        def kill(jobName: str) -> None:
             # Delete the requested job in the foreground.
             # This doesn't block, but it does delete expeditiously.
             logger.debug('Deleting Kubernetes job %s', jobName)
-            response = self._try_kubernetes(self._api('batch').delete_namespaced_job, jobName,
-                                                                self.namespace,
-                                                                propagation_policy='Foreground')
+            self._try_kubernetes(self.batch_api.delete_namespaced_job, jobName,
+                                 self.namespace,
+                                 propagation_policy='Foreground')
             logger.debug('Killed job by request: %s', jobName)
 
-        for jobID in jobIDs:
-            # Now we need to wait for all the jobs we killed to be gone.
-
-            # Work out what the job would be named
-            jobName = self.job_prefix + str(jobID)
+        def kill_batch(batchIDs: List[int]) -> None:
+            # Delete a bunch of jobs in one request, by their ID labels.
+            selector = self._selector_for_jobs(batchIDs)
+            logger.debug('Deleting Kubernetes jobs with %s', selector)
+            self._try_kubernetes(self.batch_api.delete_collection_namespaced_job,
+                                 self.namespace,
+                                 label_selector=selector,
+                                 propagation_policy='Foreground')
+
+        # The deletes don't depend on each other, so send them all at once.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.job_deletion_threads) as pool:
+            if len(jobNames) > self.kill_collection_threshold:
+                # There are a lot, so delete them in batches. We keep the
+                # batches small enough to keep the selector a sensible length.
+                killIDs = [jobID for jobID in jobIDs if jobID in issuedOnKubernetes]
+                batches = [killIDs[i:i + self.kill_collection_size]
+                           for i in range(0, len(killIDs), self.kill_collection_size)]
+                # Make sure to raise any errors.
+                list(pool.map(kill_batch, batches))
+            else:
+                list(pool.map(kill, jobNames))
 
-            # Block until it doesn't exist
-            self._waitForJobDeath(jobName)
+        # Now we need to wait for all the jobs we killed to be gone.
+        self._waitForJobsDeath([self.job_prefix + str(jobID) for jobID in jobIDs])
 
     @classmethod
     def get_default_kubernetes_owner(cls) -> str:
@@ -1243,9 +2267,9 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
 
         # Make a Kubernetes-acceptable version of our username: not too long,
         # and all lowercase letters, numbers, or - or .
-        acceptable_chars = set(string.ascii_lowercase + string.digits + '-.')
-
-        return ''.join([c for c in get_user_name().lower() if c in acceptable_chars])[:100]
+        # Drop anything non-ASCII, and then anything else we can't use.
+        ascii_name = get_user_name().lower().encode('ascii', 'ignore').decode('ascii')
+        return ascii_name.translate(KUBERNETES_OWNER_DELETIONS)[:100]
 
     @classmethod
     def add_options(cls, parser: Union[ArgumentParser, _ArgumentGroup]) -> None:
@@ -1258,6 +2282,9 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
         parser.add_argument("--kubernetesServiceAccount", dest="kubernetes_service_account", default=None,
                             help="Service account to run jobs as.  "
                                  "(default: %(default)s)")
+        parser.add_argument("--kubernetesPollMaxInterval", dest="kubernetes_poll_max_interval", default=60.0, type=float,
+                            help="Maximum number of seconds to wait between checks on Kubernetes when it is "
+                                 f"having trouble. Must be at least {cls.min_poll_interval}.  (default: %(default)s)")
 
     OptionType = TypeVar('OptionType')
     @classmethod
@@ -1265,4 +2292,11 @@ class KubernetesBatchSystem(BatchSystemCleanupSupport):
         setOption("kubernetes_host_path", default=None, env=['TOIL_KUBERNETES_HOST_PATH'])
         setOption("kubernetes_owner", default=cls.get_default_kubernetes_owner(), env=['TOIL_KUBERNETES_OWNER'])
         setOption("kubernetes_service_account", default=None, env=['TOIL_KUBERNETES_SERVICE_ACCOUNT'])
+        def check_poll_max_interval(interval: float) -> None:
+            # Polling any faster would hammer Kubernetes just when it is having trouble.
+            assert interval >= cls.min_poll_interval, \
+                f"Kubernetes poll max interval must be at least {cls.min_poll_interval} seconds."
+
+        setOption("kubernetes_poll_max_interval", float, check_poll_max_interval, default=60.0,
+                  env=['TOIL_KUBERNETES_POLL_MAX_INTERVAL'])
 
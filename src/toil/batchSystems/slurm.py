@@ -14,46 +14,248 @@
 import logging
 import math
 import os
+import re
+import time
 from argparse import ArgumentParser, _ArgumentGroup
-from pipes import quote
-from typing import Callable, Dict, List, Optional, TypeVar, Union
+from concurrent.futures import Future
+from queue import Queue
+from shlex import quote
+from threading import Lock, Thread
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar, Union
 
 from toil.batchSystems.abstractGridEngineBatchSystem import (
     AbstractGridEngineBatchSystem,
 )
-from toil.lib.misc import CalledProcessErrorStderr, call_command
+from toil.lib.misc import CalledProcessErrorStderr, call_command, iter_command
 
 logger = logging.getLogger(__name__)
 
+# A key=value pair in `scontrol show job` output. Keys can contain characters
+# like ':' and '/', and values can contain '=' or white-space.
+_SCONTROL_KV_RE = re.compile(r'([^\s=]+)=(.*?)(?=\s+[^\s=]+=|\s*$)')
+
+# How many job IDs to pass to a single `sacct` call by default, since long lists
+# can overflow the command line or be cut off by sacct. TOIL_SLURM_SACCT_CHUNK
+# can override this.
+SACCT_CHUNK_SIZE = 500
+
+# An elapsed time in the [days-][hours:]minutes:seconds format used by squeue.
+_ELAPSED_RE = re.compile(r'^(?:(\d+)-)?(?:(\d+):)?(\d+):(\d+)$')
+
+
+class _SqueueCache:
+    """
+    Process-wide cache of the rows printed by `squeue`, so that repeated polls
+    for the same running jobs within a short window share a single subprocess.
+    """
+
+    _lock = Lock()
+    _timestamp: Optional[float] = None
+    _job_ids: Optional[str] = None
+    _rows: List[Tuple[str, str]] = []
+
+    @classmethod
+    def get_rows(cls, job_ids: List[str], ttl: float, chunk_size: int = SACCT_CHUNK_SIZE) -> List[Tuple[str, str]]:
+        """
+        Get the (job ID, elapsed time) rows for those of `job_ids` that are
+        running, re-running `squeue` only if the cached rows are for other jobs
+        or are older than `ttl` seconds. At most `chunk_size` job IDs are passed
+        to each `squeue` call.
+        """
+        with cls._lock:
+            now = time.monotonic()
+            key = ','.join(job_ids)
+            if cls._job_ids != key or cls._timestamp is None or now - cls._timestamp > ttl:
+                rows = []
+                for i in range(0, len(job_ids), chunk_size):
+                    # squeue arguments:
+                    # -h for no header
+                    # -t R to only list running jobs
+                    # -j to only list our jobs
+                    # --format to get jobid i and time days-hours:minutes:seconds
+                    try:
+                        out = call_command(['squeue', '-h', '-t', 'R', '-j', ','.join(job_ids[i:i + chunk_size]),
+                                            '--format', '%i %M'])
+                    except CalledProcessErrorStderr as e:
+                        # squeue complains if the only job we ask about has already left the queue.
+                        if 'Invalid job id' not in str(e.stderr):
+                            raise
+                        out = ''
+                    for line in out.splitlines():
+                        slurm_jobid, _, elapsed_time = line.strip().partition(' ')
+                        if elapsed_time:
+                            rows.append((slurm_jobid, elapsed_time.strip()))
+                cls._rows = rows
+                cls._job_ids = key
+                cls._timestamp = now
+            return cls._rows
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """
+        Make the next lookup run `squeue` again, e.g. after a job was submitted
+        or killed.
+        """
+        with cls._lock:
+            cls._timestamp = None
+
+
+def _query_sacct(job_id_list: list, chunk_size: int = SACCT_CHUNK_SIZE) -> dict:
+    """
+    Get SLURM job exit codes for the jobs in `job_id_list` by running `sacct`.
+    Long lists are looked up in chunks, to keep the command line short.
+    :param job_id_list: list of integer batch job IDs.
+    :param chunk_size: most job IDs to look up with one `sacct` call.
+    :return: dict of job statuses, where key is the job-id, and value is a tuple
+    containing the job's state and exit code.
+    """
+    # Collect the job statuses in a dict; key is the job-id, value is a tuple containing
+    # job state and exit status. Initialize dict before processing output of `sacct`.
+    job_statuses = {}
+    for job_id in job_id_list:
+        job_statuses[job_id] = (None, None)
+
+    for i in range(0, len(job_id_list), chunk_size):
+        job_ids = ",".join(str(id) for id in job_id_list[i:i + chunk_size])
+        args = ['sacct',
+                '-n',  # no header
+                '-j', job_ids,  # job
+                '--format', 'JobIDRaw,State,ExitCode',  # specify output columns
+                '-P',  # separate columns with pipes
+                '-S', '1970-01-01']  # override start time limit
+
+        for line in iter_command(args):
+            #logger.debug("%s output %s", args[0], line)
+            values = line.strip().split('|')
+            if len(values) < 3:
+                continue
+            job_id_raw, state, exitcode = values
+            logger.debug("%s state of job %s is %s", args[0], job_id_raw, state)
+            # JobIDRaw is in the form JobID[.JobStep]; we're not interested in job steps.
+            job_id_parts = job_id_raw.split(".")
+            if len(job_id_parts) > 1:
+                continue
+            job_id = int(job_id_parts[0])
+            status, signal = [int(n) for n in exitcode.split(':')]
+            if signal > 0:
+                # A non-zero signal may indicate e.g. an out-of-memory killed job
+                status = 128 + signal
+            logger.debug("%s exit code of job %d is %s, return status %d",
+                         args[0], job_id, exitcode, status)
+            job_statuses[job_id] = state, status
+    logger.debug("sacct returning job statuses: %s", job_statuses)
+    return job_statuses
+
+
+class _SacctBatcher:
+    """
+    Coalesces `sacct` lookups from concurrent callers. A daemon thread takes
+    every request queued up while the previous `sacct` was running, looks all
+    of their job IDs up in one call and hands each caller its share.
+    """
+
+    _queue: "Queue[Tuple[list, int, Future]]" = Queue()
+    _thread: Optional[Thread] = None
+    _lock = Lock()
+
+    @classmethod
+    def submit(cls, job_id_list: list, chunk_size: int = SACCT_CHUNK_SIZE) -> Future:
+        """
+        Queue up a lookup of the given integer job IDs, to be done with at
+        most `chunk_size` job IDs per `sacct` call.
+
+        :return: a Future for the dict that `_query_sacct` would return for them.
+        """
+        with cls._lock:
+            if cls._thread is None:
+                cls._thread = Thread(target=cls._run, daemon=True)
+                cls._thread.start()
+        future: Future = Future()
+        cls._queue.put((job_id_list, chunk_size, future))
+        return future
+
+    @classmethod
+    def _run(cls) -> None:
+        while True:
+            requests = [cls._queue.get()]
+            while not cls._queue.empty():
+                requests.append(cls._queue.get_nowait())
+            # Ask about each job once, in the order the jobs were asked about
+            union = list(dict.fromkeys(job_id for job_id_list, _, _ in requests for job_id in job_id_list))
+            # Stay within what every caller asked for
+            chunk_size = min(chunk_size for _, chunk_size, _ in requests)
+            try:
+                job_statuses = _query_sacct(union, chunk_size)
+            except Exception as e:
+                for _, _, future in requests:
+                    future.set_exception(e)
+                continue
+            for job_id_list, _, future in requests:
+                future.set_result({job_id: job_statuses[job_id] for job_id in job_id_list})
+
 
 class SlurmBatchSystem(AbstractGridEngineBatchSystem):
 
     class Worker(AbstractGridEngineBatchSystem.Worker):
 
+        # Job states in which a job can still change state
+        _running_states = frozenset({'PENDING', 'RUNNING', 'CONFIGURING', 'COMPLETING', 'RESIZING', 'SUSPENDED'})
+
+        def __init__(self, newJobsQueue, updatedJobsQueue, killQueue, killedJobsQueue, boss):
+            super().__init__(newJobsQueue, updatedJobsQueue, killQueue, killedJobsQueue, boss)
+            # The (state, exit code) of our jobs that have finished, by Slurm job
+            # ID, until we have told the leader about them.
+            self._terminal_cache: Dict[int, Tuple[str, int]] = {}
+            self._terminal_cache_lock = Lock()
+            # The sbatch options that come from the environment are the same for every
+            # job, so work them out once.
+            self._parallel_env = os.getenv('TOIL_SLURM_PE')
+            # "Native extensions" for SLURM (see DRMAA or SAGA)
+            nativeConfig = os.getenv('TOIL_SLURM_ARGS')
+            self._native_args: List[str] = []
+            if nativeConfig is not None:
+                logger.debug("Native SLURM options appended to sbatch from TOIL_SLURM_ARGS env. variable: %s", nativeConfig)
+                if ("--mem" in nativeConfig) or ("--cpus-per-task" in nativeConfig):
+                    raise ValueError(f"Some resource arguments are incompatible: {nativeConfig}")
+
+                self._native_args = nativeConfig.split()
+            # How many job IDs to look up with each sacct or squeue call
+            chunk_size = os.getenv('TOIL_SLURM_SACCT_CHUNK', str(SACCT_CHUNK_SIZE))
+            try:
+                self._sacct_chunk_size = int(chunk_size)
+            except ValueError:
+                self._sacct_chunk_size = 0
+            if self._sacct_chunk_size < 1:
+                raise ValueError(f"TOIL_SLURM_SACCT_CHUNK must be a positive integer, not {chunk_size!r}")
+
         def getRunningJobIDs(self):
             # Should return a dictionary of Job IDs and number of seconds
             times = {}
             with self.runningJobsLock:
                 currentjobs = {str(self.batchJobIDs[x][0]): x for x in self.runningJobs}
             # currentjobs is a dictionary that maps a slurm job id (string) to our own internal job id
-            # squeue arguments:
-            # -h for no header
-            # --format to get jobid i, state %t and time days-hours:minutes:seconds
-
-            lines = call_command(['squeue', '-h', '--format', '%i %t %M']).split('\n')
-            for line in lines:
-                values = line.split()
-                if len(values) < 3:
-                    continue
-                slurm_jobid, state, elapsed_time = values
-                if slurm_jobid in currentjobs and state == 'R':
-                    seconds_running = self.parse_elapsed(elapsed_time)
-                    times[currentjobs[slurm_jobid]] = seconds_running
+            if not currentjobs:
+                return times
+            # Only ask squeue about our own running jobs, rather than every job on the cluster.
+            ttl = float(os.getenv('TOIL_SLURM_SQUEUE_CACHE_TTL', self.boss.config.statePollingWait))
+            for slurm_jobid, elapsed_time in _SqueueCache.get_rows(sorted(currentjobs), ttl, self._sacct_chunk_size):
+                if slurm_jobid in currentjobs:
+                    times[currentjobs[slurm_jobid]] = self.parse_elapsed(elapsed_time)
 
             return times
 
+        def forgetJob(self, jobID):
+            job = self.batchJobIDs.get(jobID)
+            super().forgetJob(jobID)
+            if job is not None:
+                # The leader knows this job is done, so we won't be asked about
+                # it again.
+                with self._terminal_cache_lock:
+                    self._terminal_cache.pop(int(job[0]), None)
+
         def killJob(self, jobID):
             call_command(['scancel', self.getBatchSystemID(jobID)])
+            _SqueueCache.invalidate()
 
         def prepareSubmission(self,
                               cpu: int,
@@ -72,6 +274,7 @@ class SlurmBatchSystem(AbstractGridEngineBatchSystem):
                 # sbatch prints a line like 'Submitted batch job 2954103'
                 result = int(output.strip().split()[-1])
                 logger.debug("sbatch submitted job %d", result)
+                _SqueueCache.invalidate()
                 return result
             except OSError as e:
                 logger.error("sbatch command failed")
@@ -114,11 +317,25 @@ class SlurmBatchSystem(AbstractGridEngineBatchSystem):
             :return: dict of job statuses, where key is the integer job ID, and value is a tuple
             containing the job's state and exit code.
             """
-            try:
-                status_dict = self._getJobDetailsFromSacct(job_id_list)
-            except CalledProcessErrorStderr:
-                status_dict = self._getJobDetailsFromScontrol(job_id_list)
-            return status_dict
+            with self._terminal_cache_lock:
+                cached = {job_id: self._terminal_cache[job_id] for job_id in job_id_list
+                          if job_id in self._terminal_cache}
+            to_query = [job_id for job_id in job_id_list if job_id not in cached]
+            status_dict = {}
+            if to_query:
+                try:
+                    status_dict = self._getJobDetailsFromSacct(to_query)
+                except CalledProcessErrorStderr:
+                    status_dict = self._getJobDetailsFromScontrol(to_query)
+                # Jobs that have finished won't change any more, so don't ask about them again.
+                finished = {job_id: status for job_id, status in status_dict.items()
+                            if status[0] is not None and status[0] not in self._running_states}
+                if finished:
+                    with self._terminal_cache_lock:
+                        self._terminal_cache.update(finished)
+            # Keep the statuses in the order they were asked for
+            return {job_id: cached[job_id] if job_id in cached else status_dict[job_id]
+                    for job_id in job_id_list}
 
         def _get_job_return_code(self, status: tuple) -> list:
             """
@@ -129,53 +346,19 @@ class SlurmBatchSystem(AbstractGridEngineBatchSystem):
             state, rc = status
             # If job is in a running state, set return code to None to indicate we don't have
             # an update.
-            if state in ('PENDING', 'RUNNING', 'CONFIGURING', 'COMPLETING', 'RESIZING', 'SUSPENDED'):
+            if state in self._running_states:
                 rc = None
             return rc
 
         def _getJobDetailsFromSacct(self, job_id_list: list) -> dict:
             """
             Get SLURM job exit codes for the jobs in `job_id_list` by running `sacct`.
+            Concurrent requests are merged into a single `sacct` call.
             :param job_id_list: list of integer batch job IDs.
             :return: dict of job statuses, where key is the job-id, and value is a tuple
             containing the job's state and exit code.
             """
-            job_ids = ",".join(str(id) for id in job_id_list)
-            args = ['sacct',
-                    '-n',  # no header
-                    '-j', job_ids,  # job
-                    '--format', 'JobIDRaw,State,ExitCode',  # specify output columns
-                    '-P',  # separate columns with pipes
-                    '-S', '1970-01-01']  # override start time limit
-            stdout = call_command(args)
-
-            # Collect the job statuses in a dict; key is the job-id, value is a tuple containing
-            # job state and exit status. Initialize dict before processing output of `sacct`.
-            job_statuses = {}
-            for job_id in job_id_list:
-                job_statuses[job_id] = (None, None)
-
-            for line in stdout.splitlines():
-                #logger.debug("%s output %s", args[0], line)
-                values = line.strip().split('|')
-                if len(values) < 3:
-                    continue
-                job_id_raw, state, exitcode = values
-                logger.debug("%s state of job %s is %s", args[0], job_id_raw, state)
-                # JobIDRaw is in the form JobID[.JobStep]; we're not interested in job steps.
-                job_id_parts = job_id_raw.split(".")
-                if len(job_id_parts) > 1:
-                    continue
-                job_id = int(job_id_parts[0])
-                status, signal = [int(n) for n in exitcode.split(':')]
-                if signal > 0:
-                    # A non-zero signal may indicate e.g. an out-of-memory killed job
-                    status = 128 + signal
-                logger.debug("%s exit code of job %d is %s, return status %d",
-                             args[0], job_id, exitcode, status)
-                job_statuses[job_id] = state, status
-            logger.debug("%s returning job statuses: %s", args[0], job_statuses)
-            return job_statuses
+            return _SacctBatcher.submit(job_id_list, self._sacct_chunk_size).result()
 
         def _getJobDetailsFromScontrol(self, job_id_list: list) -> dict:
             """
@@ -185,6 +368,7 @@ class SlurmBatchSystem(AbstractGridEngineBatchSystem):
             containing the job's state and exit code.
             """
             args = ['scontrol',
+                    '-o',  # one line per job
                     'show',
                     'job']
             # `scontrol` can only return information about a single job,
@@ -192,64 +376,41 @@ class SlurmBatchSystem(AbstractGridEngineBatchSystem):
             if len(job_id_list) == 1:
                 args.append(str(job_id_list[0]))
 
-            stdout = call_command(args)
-
-            # Job records are separated by a blank line.
-            if isinstance(stdout, str):
-                job_records = stdout.strip().split('\n\n')
-            elif isinstance(stdout, bytes):
-                job_records = stdout.decode('utf-8').strip().split('\n\n')
-
             # Collect the job statuses in a dict; key is the job-id, value is a tuple containing
             # job state and exit status. Initialize dict before processing output of `scontrol`.
             job_statuses = {}
             for job_id in job_id_list:
                 job_statuses[job_id] = (None, None)
 
-            # `scontrol` will report "No jobs in the system", if there are no jobs in the system,
-            # and if no job-id was passed as argument to `scontrol`.
-            if len(job_records) > 0 and job_records[0] == "No jobs in the system":
-                return job_statuses
-
-            for record in job_records:
-                job = {}
-                for line in record.splitlines():
-                    for item in line.split():
-                        #logger.debug("%s output %s", args[0], item)
-                        # Output is in the form of many key=value pairs, multiple pairs on each line
-                        # and multiple lines in the output. Each pair is pulled out of each line and
-                        # added to a dictionary.
-                        # Note: In some cases, the value itself may contain white-space. So, if we find
-                        # a key without a value, we consider that key part of the previous value.
-                        bits = item.split('=', 1)
-                        if len(bits) == 1:
-                            job[key] += ' ' + bits[0]
-                        else:
-                            key = bits[0]
-                            job[key] = bits[1]
-                    # The first line of the record contains the JobId. Stop processing the remainder
-                    # of this record, if we're not interested in this job.
-                    job_id = int(job['JobId'])
-                    if job_id not in job_id_list:
-                        logger.debug("%s job %d is not in the list", args[0], job_id)
-                        break
+            for record in iter_command(args):
+                record = record.strip()
+                if not record:
+                    continue
+                # `scontrol` will report "No jobs in the system", if there are no jobs in the system,
+                # and if no job-id was passed as argument to `scontrol`.
+                if record == "No jobs in the system":
+                    continue
+                # The record starts with its JobId. Skip the rest of a record we're not
+                # interested in.
+                job_id = int(record.split(None, 1)[0].partition('=')[2])
                 if job_id not in job_id_list:
+                    logger.debug("%s job %d is not in the list", args[0], job_id)
                     continue
+                # Each line is in the form of many key=value pairs. Values may contain
+                # white-space, so a value runs until the next key.
+                job = dict(_SCONTROL_KV_RE.findall(record))
                 state = job['JobState']
                 logger.debug("%s state of job %s is %s", args[0], job_id, state)
-                try:
-                    exitcode = job['ExitCode']
-                    if exitcode is not None:
-                        status, signal = [int(n) for n in exitcode.split(':')]
-                        if signal > 0:
-                            # A non-zero signal may indicate e.g. an out-of-memory killed job
-                            status = 128 + signal
-                        logger.debug("%s exit code of job %d is %s, return status %d",
-                                     args[0], job_id, exitcode, status)
-                        rc = status
-                    else:
-                        rc = None
-                except KeyError:
+                exitcode = job.get('ExitCode')
+                if exitcode:
+                    status, signal = [int(n) for n in exitcode.split(':')]
+                    if signal > 0:
+                        # A non-zero signal may indicate e.g. an out-of-memory killed job
+                        status = 128 + signal
+                    logger.debug("%s exit code of job %d is %s, return status %d",
+                                 args[0], job_id, exitcode, status)
+                    rc = status
+                else:
                     rc = None
                 job_statuses[job_id] = (state, rc)
             logger.debug("%s returning job statuses: %s", args[0], job_statuses)
@@ -271,23 +432,19 @@ class SlurmBatchSystem(AbstractGridEngineBatchSystem):
             #  Returns the sbatch command line before the script to run
             sbatch_line = ['sbatch', '-J', f'toil_job_{jobID}_{jobName}']
 
-            environment = {}
-            environment.update(self.boss.environment)
+            # The boss's environment can still change through setEnv(), so it is
+            # read for each job, but only copied if there is something to merge in.
+            environment = self.boss.environment
             if job_environment:
-                environment.update(job_environment)
+                environment = {**environment, **job_environment}
 
             if environment:
-                argList = []
-
-                for k, v in environment.items():
-                    quoted_value = quote(os.environ[k] if v is None else v)
-                    argList.append(f'{k}={quoted_value}')
+                env = os.environ
+                sbatch_line.append('--export=' + ','.join(f'{k}={quote(env[k] if v is None else v)}'
+                                                          for k, v in environment.items()))
 
-                sbatch_line.append('--export=' + ','.join(argList))
-
-            parallel_env = os.getenv('TOIL_SLURM_PE')
-            if cpu and cpu > 1 and parallel_env:
-                sbatch_line.append(f'--partition={parallel_env}')
+            if cpu and cpu > 1 and self._parallel_env:
+                sbatch_line.append(f'--partition={self._parallel_env}')
 
             if mem is not None and self.boss.config.allocate_mem:
                 # memory passed in is in bytes, but slurm expects megabytes
@@ -313,40 +470,42 @@ class SlurmBatchSystem(AbstractGridEngineBatchSystem):
             stderrfile: str = self.boss.formatStdOutErrPath(jobID, '%j', 'err')
             sbatch_line.extend(['-o', stdoutfile, '-e', stderrfile])
 
-            # "Native extensions" for SLURM (see DRMAA or SAGA)
-            nativeConfig = os.getenv('TOIL_SLURM_ARGS')
-            if nativeConfig is not None:
-                logger.debug("Native SLURM options appended to sbatch from TOIL_SLURM_ARGS env. variable: %s", nativeConfig)
-                if ("--mem" in nativeConfig) or ("--cpus-per-task" in nativeConfig):
-                    raise ValueError(f"Some resource arguments are incompatible: {nativeConfig}")
-
-                sbatch_line.extend(nativeConfig.split())
+            sbatch_line.extend(self._native_args)
 
             return sbatch_line
 
         def parse_elapsed(self, elapsed):
             # slurm returns elapsed time in days-hours:minutes:seconds format
-            # Sometimes it will only return minutes:seconds, so days may be omitted
-            # For ease of calculating, we'll make sure all the delimeters are ':'
-            # Then reverse the list so that we're always counting up from seconds -> minutes -> hours -> days
-            total_seconds = 0
-            try:
-                elapsed = elapsed.replace('-', ':').split(':')
-                elapsed.reverse()
-                seconds_per_unit = [1, 60, 3600, 86400]
-                for index, multiplier in enumerate(seconds_per_unit):
-                    if index < len(elapsed):
-                        total_seconds += multiplier * int(elapsed[index])
-            except ValueError:
-                pass  # slurm may return INVALID instead of a time
-            return total_seconds
+            # Sometimes it will only return minutes:seconds, so days and hours may be omitted
+            match = _ELAPSED_RE.match(elapsed)
+            if match is None:
+                return 0  # slurm may return INVALID instead of a time
+            days, hours, minutes, seconds = match.groups(default='0')
+            return int(days) * 86400 + int(hours) * 3600 + int(minutes) * 60 + int(seconds)
 
     ###
     ### The interface for SLURM
     ###
 
+    # The wait duration worked out from the Slurm configuration, once we have it
+    _wait_duration: Optional[int] = None
+
     @classmethod
     def getWaitDuration(cls):
+        # The scheduler's configuration doesn't change while we run, so only ask once.
+        if cls._wait_duration is None:
+            cls._wait_duration = cls._get_wait_duration_from_config()
+        return cls._wait_duration
+
+    @classmethod
+    def _reset_wait_duration(cls) -> None:
+        """
+        Forget the wait duration, so it is read from the Slurm configuration again.
+        """
+        cls._wait_duration = None
+
+    @classmethod
+    def _get_wait_duration_from_config(cls) -> int:
         # Extract the slurm batchsystem config for the appropriate value
         lines = call_command(['scontrol', 'show', 'config']).split('\n')
         time_value_list = []
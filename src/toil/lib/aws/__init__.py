@@ -30,6 +30,22 @@ logger = logging.getLogger(__name__)
 # This file isn't allowed to import anything that depends on Boto or Boto3,
 # which may not be installed, because it has to be importable everywhere.
 
+# Matches an availability zone, capturing the region and the zone letter.
+AVAILABILITY_ZONE_RE = re.compile(r'^([a-z]{2}-[a-z]+-[1-9][0-9]*)([a-z])$')
+
+@lru_cache(maxsize=1)
+def _get_boto() -> Optional[Any]:
+    """
+    Import boto 2, if it is installed, and return the module, or None.
+
+    The answer is remembered, so a missing boto is only looked for once.
+    """
+    try:
+        import boto
+        return boto
+    except ImportError:
+        return None
+
 def get_current_aws_region() -> Optional[str]:
     """
     Return the AWS region that the currently configured AWS zone (see
@@ -45,10 +61,14 @@ def get_aws_zone_from_environment() -> Optional[str]:
     """
     return os.environ.get('TOIL_AWS_ZONE', None)
 
+@lru_cache(maxsize=1)
 def get_aws_zone_from_metadata() -> Optional[str]:
     """
     Get the AWS zone from instance metadata, if on EC2 and the boto module is
     available. Otherwise, gets the AWS zone from ECS task metadata, if on ECS.
+
+    The zone we are running in can't change, so the metadata is only fetched
+    once per process.
     """
 
     # When running on ECS, we also appear to be running on EC2, but the EC2
@@ -69,34 +89,34 @@ def get_aws_zone_from_metadata() -> Optional[str]:
     if running_on_ec2():
         # On EC2 alone, or on ECS but we couldn't get ahold of the ECS
         # metadata.
+        boto = _get_boto()
+        if boto is None:
+            # This is expected to happen a lot
+            logger.debug("No boto to fetch ECS metadata")
+            return None
         try:
             # Use the EC2 metadata service
-            import boto
             from boto.utils import get_instance_metadata
             logger.debug("Fetch AZ from EC2 metadata")
             return get_instance_metadata()['placement']['availability-zone']
-        except ImportError:
-            # This is expected to happen a lot
-            logger.debug("No boto to fetch ECS metadata")
         except (KeyError, URLError) as e:
             # We're on EC2 but can't get the metadata. That's odd.
             logger.warning("Skipping EC2 metadata due to error: %s", e)
     return None
 
+@lru_cache(maxsize=1)
 def get_aws_zone_from_boto() -> Optional[str]:
     """
     Get the AWS zone from the Boto config file, if it is configured and the
     boto module is available.
     """
-    try:
-        import boto
-        zone = boto.config.get('Boto', 'ec2_region_name')
-        if zone is not None:
-            zone += 'a'  # derive an availability zone in the region
-        return zone
-    except ImportError:
-        pass
-    return None
+    boto = _get_boto()
+    if boto is None:
+        return None
+    zone = boto.config.get('Boto', 'ec2_region_name')
+    if zone is not None:
+        zone += 'a'  # derive an availability zone in the region
+    return zone
 
 def get_aws_zone_from_environment_region() -> Optional[str]:
     """
@@ -133,25 +153,31 @@ def get_current_aws_zone() -> Optional[str]:
 
 def zone_to_region(zone: str) -> str:
     """Get a region (e.g. us-west-2) from a zone (e.g. us-west-1c)."""
-    # re.compile() caches the regex internally so we don't have to
-    availability_zone = re.compile(r'^([a-z]{2}-[a-z]+-[1-9][0-9]*)([a-z])$')
-    m = availability_zone.match(zone)
+    m = AVAILABILITY_ZONE_RE.match(zone)
     if not m:
         raise ValueError(f"Can't extract region from availability zone '{zone}'")
     return m.group(1)
 
+@lru_cache(maxsize=1)
 def running_on_ec2() -> bool:
     """
     Return True if we are currently running on EC2, and false otherwise.
+
+    The answer is remembered, so the metadata service is only probed once.
     """
     # TODO: Move this to toil.lib.ec2 and make toil.lib.ec2 importable without boto?
-    def file_begins_with(path, prefix):
-        with open(path) as f:
-            return f.read(len(prefix)) == prefix
-
     hv_uuid_path = '/sys/hypervisor/uuid'
-    if os.path.exists(hv_uuid_path) and file_begins_with(hv_uuid_path, 'ec2'):
-        return True
+    try:
+        fd = os.open(hv_uuid_path, os.O_RDONLY)
+        try:
+            head = os.read(fd, 3)
+        finally:
+            os.close(fd)
+        if head == b'ec2':
+            return True
+    except OSError:
+        # No such file, or we can't read it.
+        pass
     # Some instances do not have the /sys/hypervisor/uuid file, so check the identity document instead.
     # See https://docs.aws.amazon.com/AWSEC2/latest/UserGuide/instance-identity-documents.html
     try:
@@ -11,6 +11,7 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import atexit
 import collections
 import inspect
 import logging
@@ -18,6 +19,7 @@ import os
 import re
 import socket
 import threading
+import weakref
 from functools import lru_cache
 from urllib.request import urlopen
 from urllib.error import URLError
@@ -45,6 +47,10 @@ import boto.connection
 
 logger = logging.getLogger(__name__)
 
+# All the Boto 3 clients handed out by client() and resource(), so their
+# connections can be closed when we are done. See close_clients().
+_open_clients: "weakref.WeakSet[botocore.client.BaseClient]" = weakref.WeakSet()
+
 @lru_cache(maxsize=None)
 def establish_boto3_session(region_name: Optional[str] = None) -> Session:
     """
@@ -73,6 +79,7 @@ def client(service_name: str, *args: List[Any], region_name: Optional[str] = Non
     session = establish_boto3_session(region_name=region_name)
     # MyPy can't understand our argument unpacking. See <https://github.com/vemel/mypy_boto3_builder/issues/121>
     client: botocore.client.BaseClient = session.client(service_name, *args, **kwargs) # type: ignore
+    _open_clients.add(client)
     return client
 
 @lru_cache(maxsize=None)
@@ -85,8 +92,30 @@ def resource(service_name: str, *args: List[Any], region_name: Optional[str] = N
     session = establish_boto3_session(region_name=region_name)
     # MyPy can't understand our argument unpacking. See <https://github.com/vemel/mypy_boto3_builder/issues/121>
     resource: boto3.resources.base.ServiceResource = session.resource(service_name, *args, **kwargs) # type: ignore
+    _open_clients.add(resource.meta.client)
     return resource
 
+@atexit.register
+def close_clients() -> None:
+    """
+    Close the connections held by all the clients and resources made by
+    client() and resource(), and forget them so new ones are made if needed.
+
+    Otherwise idle connections can pile up in CLOSE_WAIT over a long workflow.
+    """
+    client.cache_clear()
+    resource.cache_clear()
+    for open_client in list(_open_clients):
+        try:
+            if hasattr(open_client, 'close'):
+                open_client.close()
+            else:
+                # Older botocore doesn't have BaseClient.close()
+                open_client._endpoint.http_session.close()
+        except Exception:
+            logger.debug("Could not close AWS client %s", open_client, exc_info=True)
+    _open_clients.clear()
+
 class AWSConnectionManager:
     """
     Class that represents a connection to AWS. Caches Boto 3 and Boto 2 objects
@@ -14,19 +14,26 @@
 import errno
 import logging
 import os
+import random
 import socket
 import sys
-from typing import Any, Callable, ContextManager, Dict, Hashable, Iterable, Iterator, List, Optional, Union, cast
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from itertools import chain
+from queue import Full, Queue
+from threading import Event, Thread
+from typing import TYPE_CHECKING, Any, Callable, ContextManager, Deque, Dict, FrozenSet, Hashable, Iterable, Iterator, List, Optional, Union, cast
 from urllib.parse import ParseResult
 
 from toil.lib.aws import session
 from toil.lib.misc import printq
 from toil.lib.retry import (
+    ErrorCondition,
     retry,
     old_retry,
     get_error_status,
     get_error_code,
-    DEFAULT_DELAYS,
     DEFAULT_TIMEOUT
 )
 
@@ -37,21 +44,25 @@ else:
 
 try:
     from boto.exception import BotoServerError, S3ResponseError
+    from botocore.config import Config
     from botocore.exceptions import ClientError
+except ImportError:
+    BotoServerError = None  # type: ignore
+    # AWS/boto extra is not installed
+
+if TYPE_CHECKING:
+    # The type stubs are big and slow to import, and only matter to MyPy.
     from mypy_boto3_s3 import S3Client, S3ServiceResource
     from mypy_boto3_s3.literals import BucketLocationConstraintType
     from mypy_boto3_s3.service_resource import Bucket, Object
     from mypy_boto3_sdb import SimpleDBClient
     from mypy_boto3_iam import IAMClient, IAMServiceResource
-except ImportError:
-    BotoServerError = None  # type: ignore
-    # AWS/boto extra is not installed
 
 logger = logging.getLogger(__name__)
 
 # These are error codes we expect from AWS if we are making requests too fast.
 # https://github.com/boto/botocore/blob/49f87350d54f55b687969ec8bf204df785975077/botocore/retries/standard.py#L316
-THROTTLED_ERROR_CODES = [
+THROTTLED_ERROR_CODES: FrozenSet[str] = frozenset([
         'Throttling',
         'ThrottlingException',
         'ThrottledException',
@@ -66,13 +77,37 @@ THROTTLED_ERROR_CODES = [
         'SlowDown',
         'PriorRequestNotComplete',
         'EC2ThrottledException',
-]
+])
+
+def _s3_config() -> "Config":
+    """
+    Make the botocore configuration for the S3 clients and resources made here.
+
+    Uses a bigger connection pool than the default of 10, so concurrent
+    callers don't have to wait for or re-establish connections, keeps
+    connections alive, and lets botocore rate-limit itself when throttled.
+    """
+    settings: Dict[str, Any] = dict(max_pool_connections=64,
+                                    retries={'mode': 'adaptive', 'max_attempts': 10},
+                                    connect_timeout=5,
+                                    read_timeout=60)
+    try:
+        return Config(tcp_keepalive=True, **settings)
+    except TypeError:
+        # This botocore predates TCP keep-alive support.
+        return Config(**settings)
+
+# A single configuration object, so the cached clients and resources in
+# toil.lib.aws.session are shared between calls.
+S3_CONFIG = _s3_config() if BotoServerError is not None else None
+
+# How many IAM requests to make at once when deleting a role.
+IAM_ROLE_CLEANUP_THREADS = 8
 
 @retry(errors=[BotoServerError])
 def delete_iam_role(
     role_name: str, region: Optional[str] = None, quiet: bool = True
 ) -> None:
-    from boto.iam.connection import IAMConnection
     # TODO: the Boto3 type hints are a bit oversealous here; they want hundreds
     # of overloads of the client-getting methods to exist based on the literal
     # string passed in, to return exactly the right kind of client or resource.
@@ -82,19 +117,32 @@ def delete_iam_role(
     # we wanted MyPy to be able to understand us. So at some point we should
     # consider revising our API here to be less annoying to explain to the type
     # checker.
-    iam_client = cast(IAMClient, session.client('iam', region_name=region))
-    iam_resource = cast(IAMServiceResource, session.resource('iam', region_name=region))
-    boto_iam_connection = IAMConnection()
-    role = iam_resource.Role(role_name)
-    # normal policies
-    for attached_policy in role.attached_policies.all():
-        printq(f'Now dissociating policy: {attached_policy.policy_name} from role {role.name}', quiet)
-        role.detach_policy(PolicyArn=attached_policy.arn)
-    # inline policies
-    for inline_policy in role.policies.all():
-        printq(f'Deleting inline policy: {inline_policy.policy_name} from role {role.name}', quiet)
-        # couldn't find an easy way to remove inline policies with boto3; use boto
-        boto_iam_connection.delete_role_policy(role.name, inline_policy.policy_name)
+    iam_client = cast("IAMClient", session.client('iam', region_name=region))
+    # List everything up front through the client, which (unlike a resource)
+    # is safe to share between threads.
+    attached_policies = [policy
+                         for page in iam_client.get_paginator('list_attached_role_policies').paginate(RoleName=role_name)
+                         for policy in page['AttachedPolicies']]
+    inline_policy_names = [name
+                           for page in iam_client.get_paginator('list_role_policies').paginate(RoleName=role_name)
+                           for name in page['PolicyNames']]
+
+    def detach_policy(policy: Dict[str, Any]) -> None:
+        # normal policies
+        printq(f'Now dissociating policy: {policy["PolicyName"]} from role {role_name}', quiet)
+        iam_client.detach_role_policy(RoleName=role_name, PolicyArn=policy['PolicyArn'])
+
+    def delete_inline_policy(policy_name: str) -> None:
+        printq(f'Deleting inline policy: {policy_name} from role {role_name}', quiet)
+        iam_client.delete_role_policy(RoleName=role_name, PolicyName=policy_name)
+
+    # Each policy is its own request, so do them all at once.
+    with ThreadPoolExecutor(max_workers=IAM_ROLE_CLEANUP_THREADS) as executor:
+        futures = [executor.submit(detach_policy, policy) for policy in attached_policies]
+        futures += [executor.submit(delete_inline_policy, name) for name in inline_policy_names]
+        for future in futures:
+            # Raise any errors from the deletions.
+            future.result()
     iam_client.delete_role(RoleName=role_name)
     printq(f'Role {role_name} successfully deleted.', quiet)
 
@@ -103,7 +151,7 @@ def delete_iam_role(
 def delete_iam_instance_profile(
     instance_profile_name: str, region: Optional[str] = None, quiet: bool = True
 ) -> None:
-    iam_resource = cast(IAMServiceResource, session.resource("iam", region_name=region))
+    iam_resource = cast("IAMServiceResource", session.resource("iam", region_name=region))
     instance_profile = iam_resource.InstanceProfile(instance_profile_name)
     if instance_profile.roles is not None:
         for role in instance_profile.roles:
@@ -117,7 +165,7 @@ def delete_iam_instance_profile(
 def delete_sdb_domain(
     sdb_domain_name: str, region: Optional[str] = None, quiet: bool = True
 ) -> None:
-    sdb_client = cast(SimpleDBClient, session.client("sdb", region_name=region))
+    sdb_client = cast("SimpleDBClient", session.client("sdb", region_name=region))
     sdb_client.delete_domain(DomainName=sdb_domain_name)
     printq(f'SBD Domain: "{sdb_domain_name}" successfully deleted.', quiet)
 
@@ -136,22 +184,133 @@ def retryable_s3_errors(e: Exception) -> bool:
     """
     Return true if this is an error from S3 that looks like we ought to retry our request.
     """
-    return (connection_reset(e)
-            or (isinstance(e, BotoServerError) and e.status in (429, 500))
-            or (isinstance(e, BotoServerError) and e.code in THROTTLED_ERROR_CODES)
-            # boto3 errors
-            or (isinstance(e, (S3ResponseError, ClientError)) and get_error_code(e) in THROTTLED_ERROR_CODES)
-            or (isinstance(e, ClientError) and 'BucketNotEmpty' in str(e))
-            or (isinstance(e, ClientError) and e.response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 409 and 'try again' in str(e))
-            or (isinstance(e, ClientError) and e.response.get('ResponseMetadata', {}).get('HTTPStatusCode') in (404, 429, 500, 502, 503, 504)))
+    # Check each family of error at most once, and leave formatting the error
+    # (which can be slow for Boto 3 errors) until nothing cheaper has matched.
+    if BotoServerError is not None and isinstance(e, BotoServerError):
+        return (e.status in (429, 500)
+                or e.code in THROTTLED_ERROR_CODES
+                or (isinstance(e, S3ResponseError) and get_error_code(e) in THROTTLED_ERROR_CODES))
+    if BotoServerError is not None and isinstance(e, ClientError):
+        # boto3 errors
+        status = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+        if status in (404, 429, 500, 502, 503, 504) or get_error_code(e) in THROTTLED_ERROR_CODES:
+            return True
+        message = str(e)
+        return 'BucketNotEmpty' in message or (status == 409 and 'try again' in message)
+    return connection_reset(e)
+
+
+def full_jitter_delays(base: float = 0.1, cap: float = 60.0) -> Iterator[float]:
+    """
+    Produce an endless series of "full jitter" exponential backoff delays.
+    Each one is uniformly random between 0 and an exponentially growing,
+    capped ceiling, so clients that were throttled together don't all retry
+    together.
 
+    See <https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/>.
+    """
+    attempt = 0
+    while True:
+        yield random.uniform(0, min(cap, base * 2 ** attempt))
+        attempt += 1
+
+# The Boto 3 S3 errors that retryable_s3_errors() would retry on, for use with
+# the retry() decorator. Connection errors are retried by botocore itself.
+S3_RETRYABLE_ERRORS = [
+    ErrorCondition(error=ClientError, boto_error_codes=list(THROTTLED_ERROR_CODES)),
+    # 404 is included because a new bucket can take a moment to be visible.
+    ErrorCondition(error=ClientError, error_codes=[404, 429, 500, 502, 503, 504])
+] if BotoServerError is not None else []
 
-def retry_s3(delays: Iterable[float] = DEFAULT_DELAYS, timeout: float = DEFAULT_TIMEOUT, predicate: Callable[[Exception], bool] = retryable_s3_errors) -> Iterator[ContextManager[None]]:
+def retry_s3(delays: Optional[Iterable[float]] = None, timeout: float = DEFAULT_TIMEOUT, predicate: Callable[[Exception], bool] = retryable_s3_errors) -> Iterator[ContextManager[None]]:
     """
     Retry iterator of context managers specifically for S3 operations.
+
+    Waits between attempts according to full_jitter_delays() unless other
+    delays are given.
     """
+    if delays is None:
+        delays = full_jitter_delays()
     return old_retry(delays=delays, timeout=timeout, predicate=predicate)
 
+# The most objects S3 will delete in one DeleteObjects request, or list in one
+# ListObjectVersions request.
+S3_DELETE_BATCH_SIZE = 1000
+# How many DeleteObjects requests to run at once. S3 allows about 3500 writes
+# per second per prefix, so stay under that to avoid being told to slow down.
+S3_DELETE_THREADS = max(1, 3000 // S3_DELETE_BATCH_SIZE)
+# How many DeleteObjects requests to let queue up before we stop listing.
+S3_DELETE_MAX_PENDING = 16
+# How many pages of object versions to list ahead of the deletions.
+S3_LIST_PREFETCH_PAGES = 2
+
+def prefetch(iterable: Iterable[Any], depth: int) -> Iterator[Any]:
+    """
+    Iterate over the given iterable, while a background thread fetches up to
+    depth items ahead of the caller.
+
+    Useful for hiding the latency of a paginated listing behind the work done
+    on each page. Errors raised by the iterable are raised to the caller.
+    """
+    # Holds (True, item) pairs, then one (False, error) pair with the error the
+    # iterable raised, or None if it just ran out.
+    items: "Queue[Any]" = Queue(maxsize=depth)
+    # Set when the caller stops iterating, so the thread can quit.
+    stopped = Event()
+
+    def put(entry: Any) -> bool:
+        # Wait for space in the queue unless the caller has gone away.
+        while not stopped.is_set():
+            try:
+                items.put(entry, timeout=1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def fetch() -> None:
+        try:
+            for item in iterable:
+                if not put((True, item)):
+                    return
+        except Exception as e:
+            put((False, e))
+            return
+        put((False, None))
+
+    fetcher = Thread(target=fetch, daemon=True)
+    fetcher.start()
+    try:
+        while True:
+            more, item = items.get()
+            if not more:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        stopped.set()
+
+def delete_s3_object_versions(s3_client: "S3Client", bucket: str, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Delete the given object versions or delete markers, each with a Key and a
+    VersionId, from the given S3 bucket in a single request.
+
+    Takes at most S3_DELETE_BATCH_SIZE entries.
+
+    :return: The errors S3 reported for the entries it couldn't delete, each
+             with Key, VersionId, Code and Message.
+    """
+    response = s3_client.delete_objects(
+        Bucket=bucket,
+        Delete={
+            'Objects': [{'Key': entry['Key'], 'VersionId': entry['VersionId']} for entry in entries],
+            # Only report the objects that couldn't be deleted.
+            'Quiet': True
+        }
+    )
+    return cast(List[Dict[str, Any]], response.get('Errors', []))
+
 @retry(errors=[BotoServerError])
 def delete_s3_bucket(
     s3_resource: "S3ServiceResource",
@@ -165,17 +324,40 @@ def delete_s3_bucket(
 
     paginator = s3_resource.meta.client.get_paginator('list_object_versions')
     try:
-        for response in paginator.paginate(Bucket=bucket):
-            # Versions and delete markers can both go in here to be deleted.
-            # They both have Key and VersionId, but there's no shared base type
-            # defined for them in the stubs to express that. See
-            # <https://github.com/vemel/mypy_boto3_builder/issues/123>. So we
-            # have to do gymnastics to get them into the same list.
-            to_delete: List[Dict[str, Any]] = cast(List[Dict[str, Any]], response.get('Versions', [])) + \
-                                              cast(List[Dict[str, Any]], response.get('DeleteMarkers', []))
-            for entry in to_delete:
-                printq(f"    Deleting {entry['Key']} version {entry['VersionId']}", quiet)
-                s3_resource.meta.client.delete_object(Bucket=bucket, Key=entry['Key'], VersionId=entry['VersionId'])
+        # Delete batches in the background while we list the next page, but
+        # don't get too far ahead of the deletions.
+        pending: Deque["Future[List[Dict[str, Any]]]"] = deque()
+        # The errors S3 gave for the versions it wouldn't delete
+        errors: List[Dict[str, Any]] = []
+        with ThreadPoolExecutor(max_workers=S3_DELETE_THREADS) as executor:
+            pages = paginator.paginate(Bucket=bucket, PaginationConfig={'PageSize': S3_DELETE_BATCH_SIZE})
+            # List the next pages while we work on this one.
+            for response in prefetch(pages, S3_LIST_PREFETCH_PAGES):
+                # Versions and delete markers can both go in here to be deleted.
+                # They both have Key and VersionId, but there's no shared base type
+                # defined for them in the stubs to express that. See
+                # <https://github.com/vemel/mypy_boto3_builder/issues/123>. So we
+                # have to cast to get them into the same list.
+                to_delete = cast(List[Dict[str, Any]],
+                                 list(chain(response.get('Versions', ()), response.get('DeleteMarkers', ()))))
+                for entry in to_delete:
+                    printq(f"    Deleting {entry['Key']} version {entry['VersionId']}", quiet)
+                # Delete the whole page with as few requests as DeleteObjects allows
+                for i in range(0, len(to_delete), S3_DELETE_BATCH_SIZE):
+                    pending.append(executor.submit(delete_s3_object_versions, s3_resource.meta.client, bucket,
+                                                   to_delete[i:i + S3_DELETE_BATCH_SIZE]))
+                    while len(pending) > S3_DELETE_MAX_PENDING:
+                        errors.extend(pending.popleft().result())
+            while pending:
+                errors.extend(pending.popleft().result())
+        if errors:
+            # The bucket can't be deleted now, and S3 would just say it isn't
+            # empty, so say why it isn't.
+            raise RuntimeError(f"Could not delete {len(errors)} object versions from bucket {bucket}, "
+                               f"including: " +
+                               "; ".join(f"{error.get('Key')} version {error.get('VersionId')}: "
+                                         f"{error.get('Code')} {error.get('Message')}"
+                                         for error in errors[:10]))
         s3_resource.Bucket(bucket).delete()
         printq(f'\n * Deleted s3 bucket successfully: {bucket}\n\n', quiet)
     except s3_resource.meta.client.exceptions.NoSuchBucket:
@@ -196,6 +378,8 @@ def create_s3_bucket(
     *ALL* S3 bucket creation should use this function.
     """
     logger.debug("Creating bucket '%s' in region %s.", bucket_name, region)
+    # If a bucket by this name used to exist, it may have been somewhere else.
+    clear_bucket_region_cache()
     if region == "us-east-1":  # see https://github.com/boto/boto3/issues/125
         bucket = s3_resource.create_bucket(Bucket=bucket_name)
     else:
@@ -205,45 +389,102 @@ def create_s3_bucket(
         )
     return bucket
 
+@lru_cache(maxsize=1024)
+@retry(errors=S3_RETRYABLE_ERRORS)
 def get_bucket_region(bucket_name: str, endpoint_url: Optional[str] = None) -> str:
     """
     Get the AWS region name associated with the given S3 bucket.
     
     Takes an optional S3 API URL override.
+
+    A bucket can't move between regions, so the answer is remembered. Use
+    clear_bucket_region_cache() if a bucket might have been deleted and
+    re-created elsewhere.
     """
-    s3_client = cast(S3Client, session.client('s3', endpoint_url=endpoint_url))
-    for attempt in retry_s3():
-        with attempt:
-            loc = s3_client.get_bucket_location(Bucket=bucket_name)
-            return bucket_location_to_region(loc.get('LocationConstraint', None))
+    s3_client = cast("S3Client", session.client('s3', endpoint_url=endpoint_url, config=S3_CONFIG))
+    loc = s3_client.get_bucket_location(Bucket=bucket_name)
+    return bucket_location_to_region(loc.get('LocationConstraint', None))
             
+def clear_bucket_region_cache() -> None:
+    """
+    Forget all the bucket regions remembered by get_bucket_region().
+    """
+    get_bucket_region.cache_clear()
+
+# S3 reports us-east-1 buckets as having no location, and wants no location
+# when making them. All other regions are their own locations.
+_REGION_TO_BUCKET_LOCATION: Dict[str, str] = {'us-east-1': ''}
+_BUCKET_LOCATION_TO_REGION: Dict[Optional[str], str] = {'': 'us-east-1', None: 'us-east-1'}
+
 def region_to_bucket_location(region: str) -> str:
-    return '' if region == 'us-east-1' else region
+    return _REGION_TO_BUCKET_LOCATION.get(region, region)
 
 def bucket_location_to_region(location: Optional[str]) -> str:
-    return "us-east-1" if location == "" or location is None else location
+    # Anything not in the table is not None.
+    return _BUCKET_LOCATION_TO_REGION.get(location, cast(str, location))
+
+def _s3_endpoint_url_from_environment() -> Optional[str]:
+    """
+    Get the S3 API URL to use instead of Boto's built-in one, as set by the
+    TOIL_S3_HOST, TOIL_S3_PORT and TOIL_S3_USE_SSL environment variables, or
+    None if no override is set.
+    """
+    host = os.environ.get('TOIL_S3_HOST', None)
+    if not host:
+        return None
+    port = os.environ.get('TOIL_S3_PORT', None)
+    protocol = 'http' if os.environ.get('TOIL_S3_USE_SSL', 'True') == 'False' else 'https'
+    return f'{protocol}://{host}' + (f':{port}' if port else '')
 
-def get_object_for_url(url: ParseResult, existing: Optional[bool] = None) -> Object:
+# Decide once if we need to override Boto's built-in URL.
+S3_ENDPOINT_URL = _s3_endpoint_url_from_environment()
+
+@lru_cache(maxsize=1)
+def _supports_conditional_put() -> bool:
+    """
+    Return True if this botocore knows about conditional writes (PutObject
+    with IfNoneMatch).
+    """
+    # Ask the service model directly, so we don't need (or hold on to) a client.
+    service_model = session.establish_boto3_session()._session.get_service_model('s3')
+    return 'IfNoneMatch' in service_model.operation_model('PutObject').input_shape.members
+
+# S3 gives a 409 ConditionalRequestConflict if someone else is conditionally
+# writing the same object at the same time.
+S3_WRITE_CONFLICT_ERRORS = [
+    ErrorCondition(error=ClientError, error_codes=[409])
+] if BotoServerError is not None else []
+
+@retry(errors=S3_WRITE_CONFLICT_ERRORS)
+def _create_s3_object_if_missing(s3_client: "S3Client", bucket: str, key: str) -> bool:
+    """
+    Create an empty object in the given bucket, only if there is no object
+    there already.
+
+    Retries if a racing write conflicts, to see how that write went.
+
+    :return: True if we created the object, or False if it already existed.
+    """
+    try:
+        s3_client.put_object(Bucket=bucket, Key=key, Body=b'', IfNoneMatch='*')
+    except ClientError as e:
+        if get_error_status(e) == 412:
+            # Precondition failed; the object is there.
+            return False
+        raise
+    return True
+
+def get_object_for_url(url: ParseResult, existing: Optional[bool] = None) -> "Object":
         """
         Extracts a key (object) from a given parsed s3:// URL.
 
         :param bool existing: If True, key is expected to exist. If False, key is expected not to
                exists and it will be created. If None, the key will be created if it doesn't exist.
         """
-        s3_resource = cast(S3ServiceResource, session.resource('s3'))
-
         keyName = url.path[1:]
         bucketName = url.netloc
         
-        # Decide if we need to override Boto's built-in URL here.
-        endpoint_url: Optional[str] = None
-        host = os.environ.get('TOIL_S3_HOST', None)
-        port = os.environ.get('TOIL_S3_PORT', None)
-        protocol = 'https'
-        if os.environ.get('TOIL_S3_USE_SSL', True) == 'False':
-            protocol = 'http'
-        if host:
-            endpoint_url = f'{protocol}://{host}' + f':{port}' if port else ''
+        endpoint_url = S3_ENDPOINT_URL
 
         # TODO: OrdinaryCallingFormat equivalent in boto3?
         # if botoargs:
@@ -251,22 +492,36 @@ def get_object_for_url(url: ParseResult, existing: Optional[bool] = None) -> Obj
 
         # Get the bucket's region to avoid a redirect per request
         region = get_bucket_region(bucketName, endpoint_url=endpoint_url)
-        s3 = cast(S3ServiceResource, session.resource('s3', region_name=region, endpoint_url=endpoint_url))
+        s3 = cast("S3ServiceResource", session.resource('s3', region_name=region, endpoint_url=endpoint_url, config=S3_CONFIG))
         obj = s3.Object(bucketName, keyName)
-        objExists = True
 
-        try:
-            obj.load()
-        except ClientError as e:
-            if get_error_status(e) == 404:
-                objExists = False
-            else:
-                raise
-        if existing is True and not objExists:
-            raise RuntimeError(f"Key '{keyName}' does not exist in bucket '{bucketName}'.")
-        elif existing is False and objExists:
-            raise RuntimeError(f"Key '{keyName}' exists in bucket '{bucketName}'.")
-
-        if not objExists:
+        # Other S3 implementations might not honor conditional writes and would
+        # overwrite the object, so only use them with AWS.
+        conditional = existing is not True and endpoint_url is None and _supports_conditional_put()
+
+        if existing is not False or not conditional:
+            # Check if the object is there. When we don't know, it usually is,
+            # and looking is cheaper than writing.
+            objExists = True
+            try:
+                obj.load()
+            except ClientError as e:
+                if get_error_status(e) == 404:
+                    objExists = False
+                else:
+                    raise
+            if existing is True and not objExists:
+                raise RuntimeError(f"Key '{keyName}' does not exist in bucket '{bucketName}'.")
+            elif existing is False and objExists:
+                raise RuntimeError(f"Key '{keyName}' exists in bucket '{bucketName}'.")
+            if objExists:
+                return obj
+
+        if conditional:
+            # Create the object only if it still isn't there, so we can't clobber
+            # anything written since we looked.
+            if not _create_s3_object_if_missing(s3.meta.client, bucketName, keyName) and existing is False:
+                raise RuntimeError(f"Key '{keyName}' exists in bucket '{bucketName}'.")
+        else:
             obj.put()  # write an empty file
         return obj
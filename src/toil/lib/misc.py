@@ -6,6 +6,7 @@ import random
 import socket
 import subprocess
 import sys
+import tempfile
 import time
 import typing
 from contextlib import closing
@@ -135,3 +136,32 @@ def call_command(cmd: List[str], *args: str, input: Optional[str] = None, timeou
         raise CalledProcessErrorStderr(proc.returncode, cmd, output=stdout, stderr=stderr)
     logger.debug("command succeeded: {}: {}".format(" ".join(cmd), stdout.rstrip()))
     return stdout
+
+
+def iter_command(cmd: List[str], useCLocale: bool = True,
+                 env: Optional[typing.Dict[str, str]] = None) -> Iterator[str]:
+    """Like call_command, but yields the lines of stdout, without their line
+    endings, as the command produces them, instead of buffering all of the
+    output. CalledProcessErrorStderr is raised once stdout is exhausted, if
+    the command failed.
+    """
+
+    if useCLocale:
+        env = dict(os.environ) if env is None else dict(env)  # copy since modifying
+        env["LANGUAGE"] = env["LC_ALL"] = "C"
+
+    logger.debug("run command: {}".format(" ".join(cmd)))
+    # Send stderr to a file so a chatty command can't block on a full pipe
+    # while we are reading stdout.
+    with tempfile.TemporaryFile(mode='w+', encoding='utf-8', errors="replace") as stderr_file:
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file,
+                              encoding='utf-8', errors="replace", env=env) as proc:
+            for line in proc.stdout:
+                yield line.rstrip('\n')
+        stderr_file.seek(0)
+        stderr = stderr_file.read()
+    sys.stderr.write(stderr)
+    if proc.returncode != 0:
+        logger.debug("command failed: {}: {}".format(" ".join(cmd), stderr.rstrip()))
+        raise CalledProcessErrorStderr(proc.returncode, cmd, stderr=stderr)
+    logger.debug("command succeeded: {}".format(" ".join(cmd)))
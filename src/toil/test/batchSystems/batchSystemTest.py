@@ -511,6 +511,369 @@ class KubernetesBatchSystemBenchTest(ToilTest):
          'value': 'true'}]
         """).strip())
 
+    def test_informer_cache(self):
+        """
+        Make sure the job/pod informer cache follows lists, watch events, and
+        our own additions and removals.
+        """
+
+        from kubernetes.client import V1Job, V1JobList, V1ListMeta, V1ObjectMeta
+        from toil.batchSystems.kubernetes import KubernetesInformer
+
+        def make_job(name):
+            return V1Job(metadata=V1ObjectMeta(name=name, labels={'job-name': name}))
+
+        listed = [make_job('a'), make_job('b')]
+
+        class FakeBatchSystem:
+            namespace = 'default'
+
+            def _api(self, kind):
+                return self
+
+            def list_namespaced_job(self, namespace, **kwargs):
+                return V1JobList(items=listed, metadata=V1ListMeta(resource_version='1'))
+
+            def _try_kubernetes(self, method, *args, **kwargs):
+                return method(*args, **kwargs)
+
+            def _deserialize(self, raw_object, item_type):
+                self.deserialized.append(raw_object['metadata']['name'])
+                return make_job(raw_object['metadata']['name'])
+
+        fake = FakeBatchSystem()
+        fake.deserialized = []
+        informer = KubernetesInformer(fake, 'batch', 'list_namespaced_job',
+                                      label_selector='toil_run=test', index_label='job-name',
+                                      summarize=lambda job: job.metadata.name.upper())
+        self.assertEqual(informer._resync(), '1')
+        self.assertEqual(sorted(j.metadata.name for j in informer.values()), ['a', 'b'])
+        self.assertEqual(informer.get_by_label('b').metadata.name, 'b')
+
+        # Watch events update the cache
+        informer._apply('ADDED', make_job('c'))
+        informer._apply('DELETED', make_job('a'))
+        self.assertEqual(sorted(j.metadata.name for j in informer.values()), ['b', 'c'])
+        self.assertIsNone(informer.get_by_label('a'))
+
+        # Things we forget don't come back from stale lists or events
+        informer.forget('b')
+        informer._apply('MODIFIED', make_job('b'))
+        informer._resync()
+        self.assertEqual(sorted(j.metadata.name for j in informer.values()), ['a'])
+        # Until the cluster agrees they are gone
+        listed.pop()
+        informer._resync()
+        listed.append(make_job('b'))
+        informer._resync()
+        self.assertEqual(sorted(j.metadata.name for j in informer.values()), ['a', 'b'])
+
+        # Things we make survive lists that are too old to include them
+        informer.put(make_job('d'))
+        informer._resync()
+        self.assertEqual(sorted(j.metadata.name for j in informer.values()), ['a', 'b', 'd'])
+
+        # Raw watch events only get turned into objects if we keep them
+        informer._apply_raw('ADDED', {'metadata': {'name': 'e'}}, 'V1Job')
+        informer._apply_raw('DELETED', {'metadata': {'name': 'a'}}, 'V1Job')
+        informer.forget('b')
+        informer._apply_raw('MODIFIED', {'metadata': {'name': 'b'}}, 'V1Job')
+        self.assertEqual(fake.deserialized, ['e'])
+        self.assertEqual(sorted(j.metadata.name for j in informer.values()), ['d', 'e'])
+        self.assertEqual(informer.summaries(), {'d': 'D', 'e': 'E'})
+
+    def test_watched_job_updates(self):
+        """
+        Make sure jobs we hear about from a watch are reported when they finish.
+        """
+
+        import datetime
+
+        from kubernetes.client import (V1ContainerState,
+                                       V1ContainerStateTerminated,
+                                       V1ContainerStatus,
+                                       V1Job,
+                                       V1JobCondition,
+                                       V1JobStatus,
+                                       V1ObjectMeta,
+                                       V1Pod,
+                                       V1PodStatus)
+        from toil.batchSystems.abstractBatchSystem import BatchJobExitReason
+        from toil.batchSystems.kubernetes import KubernetesBatchSystem
+
+        start = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+
+        def make_job(jobID, **status):
+            return V1Job(metadata=V1ObjectMeta(name=f'prefix-{jobID}'),
+                         status=V1JobStatus(start_time=start,
+                                            conditions=[V1JobCondition(type='Complete', status='True')],
+                                            **status))
+
+        class FakeInformer:
+            def get(self, name):
+                # Pretend we forgot about job 4
+                return None if name == 'prefix-4' else name
+
+        batch_system = KubernetesBatchSystem.__new__(KubernetesBatchSystem)
+        batch_system.job_prefix = 'prefix-'
+        batch_system._job_prefix_length = len(batch_system.job_prefix)
+        batch_system._job_informer = FakeInformer()
+        batch_system._getPodForJob = lambda job: V1Pod(status=V1PodStatus(container_statuses=[
+            V1ContainerStatus(name='main', image='', image_id='', ready=False, restart_count=0,
+                              state=V1ContainerState(terminated=V1ContainerStateTerminated(exit_code=3)))]))
+
+        # Running jobs aren't done
+        self.assertIsNone(batch_system._getUpdatedBatchJobFromWatchedJob(make_job(1, active=1)))
+
+        # Succeeded jobs are reported
+        result = batch_system._getUpdatedBatchJobFromWatchedJob(
+            make_job(2, succeeded=1, completion_time=start + datetime.timedelta(seconds=10)))
+        self.assertEqual(result.jobID, 2)
+        self.assertEqual(result.exitStatus, 0)
+        self.assertEqual(result.exitReason, BatchJobExitReason.FINISHED)
+        self.assertAlmostEqual(result.wallTime, 10)
+
+        # Failed jobs are reported with their pod's exit code
+        result = batch_system._getUpdatedBatchJobFromWatchedJob(make_job(3, failed=1))
+        self.assertEqual(result.jobID, 3)
+        self.assertEqual(result.exitStatus, 3)
+        self.assertEqual(result.exitReason, BatchJobExitReason.FAILED)
+
+        # Jobs we are done with aren't reported again
+        self.assertIsNone(batch_system._getUpdatedBatchJobFromWatchedJob(make_job(4, succeeded=1)))
+
+    def test_informer_watch_backoff(self):
+        """
+        Make sure the job/pod informer backs off when watches fail or end with
+        nothing to say, and falls back to polling if it isn't allowed to
+        watch.
+        """
+
+        from kubernetes.client import V1Job, V1JobList, V1ListMeta, V1ObjectMeta
+        from kubernetes.client.rest import ApiException
+        from toil.batchSystems.kubernetes import KubernetesInformer
+
+        class FakeBatchSystem:
+            namespace = 'default'
+            min_poll_interval = 0.1
+
+            def __init__(self):
+                self.lists = 0
+                self.backoffs = 0
+                # What each watch does, in order
+                self.watches = [
+                    # Tells us about a new job
+                    [{'type': 'ADDED', 'raw_object': {'metadata': {'name': 'a'}}}],
+                    # Ends early with nothing to say
+                    [],
+                    # Is forbidden, over and over
+                    ApiException(status=403),
+                    ApiException(status=403),
+                    ApiException(status=403),
+                ]
+
+            def _api(self, kind):
+                return self
+
+            def list_namespaced_job(self, namespace, **kwargs):
+                """:return: V1JobList"""
+                self.lists += 1
+                return V1JobList(items=[], metadata=V1ListMeta(resource_version='1'))
+
+            def _try_kubernetes(self, method, *args, **kwargs):
+                return method(*args, **kwargs)
+
+            def _stream_watch_events(self, method, *args, **kwargs):
+                watch = self.watches.pop(0)
+                if isinstance(watch, Exception):
+                    raise watch
+                yield from watch
+
+            def _deserialize(self, raw_object, item_type):
+                return V1Job(metadata=V1ObjectMeta(name=raw_object['metadata']['name']))
+
+            def _reload_credentials_if_rejected(self, e):
+                pass
+
+            def _back_off_after_watch(self, watch_start, backoff, watch_timeout=None):
+                self.backoffs += 1
+                if self.backoffs == 6:
+                    informer.stop()
+                return backoff * 2
+
+        fake = FakeBatchSystem()
+        informer = KubernetesInformer(fake, 'batch', 'list_namespaced_job',
+                                      label_selector='toil_run=test')
+        informer._run(None)
+
+        # We watched until we were forbidden too many times, and then just
+        # listed
+        self.assertEqual(fake.watches, [])
+        self.assertEqual(fake.lists, 7)
+        # We didn't back off after the watch that told us something, but did
+        # after everything else.
+        self.assertEqual(fake.backoffs, 6)
+
+    def test_job_finished_before_pod(self):
+        """
+        Make sure that if we hear a job finished before we hear that its pod
+        did, we ask the cluster how the pod ended instead of reporting the job
+        as failed.
+        """
+
+        import datetime
+        from queue import Queue
+
+        from kubernetes.client import (V1ContainerState,
+                                       V1ContainerStateRunning,
+                                       V1ContainerStateTerminated,
+                                       V1ContainerStatus,
+                                       V1Job,
+                                       V1JobStatus,
+                                       V1ObjectMeta,
+                                       V1Pod,
+                                       V1PodList,
+                                       V1PodStatus)
+        from toil.batchSystems.kubernetes import KubernetesBatchSystem, summarize_kubernetes_job
+
+        start = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+
+        def make_pod(state):
+            return V1Pod(metadata=V1ObjectMeta(name='prefix-1-abcde'),
+                         status=V1PodStatus(start_time=start, container_statuses=[
+                             V1ContainerStatus(name='main', image='', image_id='', ready=False, restart_count=0,
+                                               state=state)]))
+
+        job = V1Job(metadata=V1ObjectMeta(name='prefix-1'),
+                    status=V1JobStatus(start_time=start, succeeded=1))
+        finished_pod = make_pod(V1ContainerState(terminated=V1ContainerStateTerminated(
+            exit_code=0, finished_at=start + datetime.timedelta(seconds=10))))
+
+        class FakeInformer:
+            def __init__(self, pod):
+                self.pod = pod
+
+            def summarized_values(self):
+                return [(job, summarize_kubernetes_job(job, len('prefix-')))]
+
+            def get_by_label(self, value):
+                return self.pod
+
+        class FakeCoreApi:
+            def __init__(self):
+                self.reads = []
+
+            def read_namespaced_pod(self, name, namespace):
+                self.reads.append(name)
+                return finished_pod
+
+            def list_namespaced_pod(self, namespace, label_selector):
+                self.reads.append(label_selector)
+                return V1PodList(items=[finished_pod])
+
+        def make_batch_system(cached_pod):
+            batch_system = KubernetesBatchSystem.__new__(KubernetesBatchSystem)
+            batch_system.job_prefix = 'prefix-'
+            batch_system._job_prefix_length = len(batch_system.job_prefix)
+            batch_system.namespace = 'default'
+            batch_system.core_api = FakeCoreApi()
+            batch_system._job_informer = FakeInformer(None)
+            batch_system._pod_informer = FakeInformer(cached_pod)
+            batch_system._failed_creations = Queue()
+            batch_system.getUpdatedLocalJob = lambda maxWait: None
+            batch_system._try_kubernetes = lambda method, *args, **kwargs: method(*args, **kwargs)
+            batch_system._try_kubernetes_expecting_gone = batch_system._try_kubernetes
+            batch_system.finished = []
+            batch_system._finish_job = batch_system.finished.append
+            return batch_system
+
+        # The pod cache still has the pod running
+        batch_system = make_batch_system(make_pod(V1ContainerState(running=V1ContainerStateRunning())))
+        result = batch_system._getUpdatedBatchJobImmediately()
+        self.assertEqual(result.jobID, 1)
+        self.assertEqual(result.exitStatus, 0)
+        self.assertAlmostEqual(result.wallTime, 10)
+        self.assertEqual(batch_system.core_api.reads, ['prefix-1-abcde'])
+        self.assertEqual(batch_system.finished, ['prefix-1'])
+
+        # The pod cache hasn't heard of the pod at all
+        batch_system = make_batch_system(None)
+        result = batch_system._getUpdatedBatchJobImmediately()
+        self.assertEqual(result.exitStatus, 0)
+        self.assertEqual(batch_system.core_api.reads, ['job-name=prefix-1'])
+
+        # The pod cache is up to date, so we don't need to ask
+        batch_system = make_batch_system(finished_pod)
+        result = batch_system._getUpdatedBatchJobImmediately()
+        self.assertEqual(result.exitStatus, 0)
+        self.assertEqual(batch_system.core_api.reads, [])
+
+    def test_credential_reload(self):
+        """
+        Make sure we only reload our Kubernetes credentials when they are
+        rejected, and only once when lots of requests find that out at once.
+        """
+
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+
+        from kubernetes.client.rest import ApiException
+        from toil.batchSystems.kubernetes import KubernetesBatchSystem
+
+        batch_system = KubernetesBatchSystem.__new__(KubernetesBatchSystem)
+        batch_system._credentials_lock = threading.Lock()
+        batch_system._credentials_loaded_at = None
+        reloads = []
+
+        def fake_reload():
+            reloads.append(None)
+            batch_system._credentials_loaded_at = time.monotonic()
+        batch_system._reload_credentials = fake_reload
+
+        # Being forbidden doesn't mean our credentials are bad
+        batch_system._reload_credentials_if_rejected(ApiException(status=403))
+        self.assertEqual(len(reloads), 0)
+
+        # Lots of unauthorized requests only make us reload once
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(batch_system._reload_credentials_if_rejected,
+                          [ApiException(status=401) for _ in range(16)]))
+        self.assertEqual(len(reloads), 1)
+
+        # But if it has been a while, we reload again
+        batch_system._credentials_loaded_at -= KubernetesBatchSystem.credential_reload_interval
+        batch_system._reload_credentials_if_rejected(ApiException(status=401))
+        self.assertEqual(len(reloads), 2)
+
+    def test_informer_paging(self):
+        """
+        Make sure the job/pod informer cache follows continuation tokens when
+        listing.
+        """
+
+        from kubernetes.client import V1Job, V1JobList, V1ListMeta, V1ObjectMeta
+        from toil.batchSystems.kubernetes import KubernetesInformer
+
+        class FakeBatchSystem:
+            namespace = 'default'
+
+            def _api(self, kind):
+                return self
+
+            def list_namespaced_job(self, namespace, **kwargs):
+                page = int(kwargs.get('_continue', 0))
+                return V1JobList(items=[V1Job(metadata=V1ObjectMeta(name=f'job{page}'))],
+                                 metadata=V1ListMeta(resource_version='1',
+                                                     _continue=str(page + 1) if page < 2 else None))
+
+            def _try_kubernetes(self, method, *args, **kwargs):
+                return method(*args, **kwargs)
+
+        informer = KubernetesInformer(FakeBatchSystem(), 'batch', 'list_namespaced_job',
+                                      label_selector='toil_run=test')
+        self.assertEqual(informer._resync(), '1')
+        self.assertEqual(sorted(j.metadata.name for j in informer.values()), ['job0', 'job1', 'job2'])
+
 
 @needs_tes
 @needs_fetchable_appliance
@@ -1,4 +1,7 @@
+import io
+import shlex
 import textwrap
+import threading
 from queue import Queue
 
 import pytest
@@ -44,8 +47,11 @@ def call_sacct(args) -> str:
 def call_scontrol(args) -> str:
     """
     The arguments passed to `call_command` when executing `scontrol` are:
-    ['scontrol', 'show', 'job'] or ['scontrol', 'show', 'job', '<job-id>']
+    ['scontrol', 'show', 'job'] or ['scontrol', 'show', 'job', '<job-id>'], optionally
+    with '-o' after 'scontrol' to print each job on one line.
     """
+    oneliner = '-o' in args
+    args = [arg for arg in args if arg != '-o']
     job_id = int(args[3]) if len(args) > 3 else None
     # Fake output per fake job-id.
     scontrol_info = {
@@ -136,6 +142,8 @@ def call_scontrol(args) -> str:
                NtasksPerTRES:0
             """),
     }
+    if oneliner:
+        scontrol_info = {key: ' '.join(value.split()) + '\n' for key, value in scontrol_info.items()}
     if job_id is not None:
         try:
             stdout = scontrol_info[job_id]
@@ -145,9 +153,36 @@ def call_scontrol(args) -> str:
         # Glue the fake outputs for the request job-ids together in a single string
         stdout = ""
         for value in scontrol_info.values():
-            stdout += value + '\n'
+            stdout += value if oneliner else value + '\n'
     return stdout
 
+def call_squeue(args) -> str:
+    """
+    The arguments passed to `call_command` when executing `squeue` are:
+    ['squeue', '-h', '-t', 'R', '-j', '<comma-separated list of job-ids>', '--format', '%i %M']
+    """
+    call_squeue.calls += 1
+    # Fake elapsed times of running jobs
+    squeue_info = {"789724": "17:22:59", "787204": "1-02:03:04"}
+    job_ids = args[args.index('-j') + 1].split(',')
+    return "".join(f"{job_id} {squeue_info[job_id]}\n" for job_id in job_ids if job_id in squeue_info)
+call_squeue.calls = 0
+
+
+def iter_sacct(args):
+    """
+    Fake `iter_command` for `sacct`, yielding the lines `call_sacct` would return.
+    """
+    return iter(call_sacct(args).splitlines())
+
+
+def iter_scontrol(args):
+    """
+    Fake `iter_command` for `scontrol`, yielding the lines `call_scontrol` would return.
+    """
+    return iter(call_scontrol(args).splitlines())
+
+
 def call_sacct_raises(*_):
     """
     Fake that the `sacct` command fails by raising a `CalledProcessErrorStderr`
@@ -163,6 +198,10 @@ class FakeBatchSystem(object):
 
     def __init__(self):
         self.config = self.__fake_config()
+        self.environment = {}
+
+    def formatStdOutErrPath(self, toil_job_id, cluster_job_id, std):
+        return f'toil_job_{toil_job_id}.{cluster_job_id}.{std}.log'
 
     def getWaitDuration(self):
         return 10;
@@ -189,55 +228,192 @@ class SlurmTest(ToilTest):
 
     def setUp(self):
         self.monkeypatch = pytest.MonkeyPatch()
-        self.worker = toil.batchSystems.slurm.SlurmBatchSystem.Worker(
+        self.worker = self.make_worker()
+
+    def make_worker(self):
+        return toil.batchSystems.slurm.SlurmBatchSystem.Worker(
             newJobsQueue=Queue(),
             updatedJobsQueue=Queue(),
             killQueue=Queue(),
             killedJobsQueue=Queue(),
             boss=FakeBatchSystem())
 
+    def tearDown(self):
+        self.monkeypatch.undo()
+        super().tearDown()
+
+    ####
+    #### tests for getRunningJobIDs()
+    ####
+
+    def test_getRunningJobIDs_cached(self):
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_squeue)
+        self.monkeypatch.setenv("TOIL_SLURM_SQUEUE_CACHE_TTL", "3600")
+        toil.batchSystems.slurm._SqueueCache.invalidate()
+        self.worker.batchJobIDs = {1: (789724, None), 2: (789728, None), 3: (787204, None)}
+        self.worker.runningJobs = {1, 2, 3}
+        call_squeue.calls = 0
+        expected_result = {1: 62579, 3: 93784}
+        for _ in range(3):
+            result = self.worker.getRunningJobIDs()
+            assert result == expected_result, "{} != {}".format(result, expected_result)
+        assert call_squeue.calls == 1, "squeue was run {} times".format(call_squeue.calls)
+        toil.batchSystems.slurm._SqueueCache.invalidate()
+        self.worker.getRunningJobIDs()
+        assert call_squeue.calls == 2, "squeue was run {} times".format(call_squeue.calls)
+        # Asking about a different set of jobs can't use the cached rows
+        self.worker.runningJobs = {1, 2}
+        result = self.worker.getRunningJobIDs()
+        assert result == {1: 62579}, result
+        assert call_squeue.calls == 3, "squeue was run {} times".format(call_squeue.calls)
+
+    def test_getRunningJobIDs_chunked(self):
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_squeue)
+        self.monkeypatch.setenv("TOIL_SLURM_SACCT_CHUNK", "2")
+        self.worker = self.make_worker()
+        toil.batchSystems.slurm._SqueueCache.invalidate()
+        self.worker.batchJobIDs = {1: (789724, None), 2: (789728, None), 3: (787204, None)}
+        self.worker.runningJobs = {1, 2, 3}
+        call_squeue.calls = 0
+        result = self.worker.getRunningJobIDs()
+        assert result == {1: 62579, 3: 93784}, result
+        assert call_squeue.calls == 2, "squeue was run {} times".format(call_squeue.calls)
+
+    def test_parse_elapsed(self):
+        for elapsed, expected_result in [("0:00", 0), ("4:05", 245), ("17:22:59", 62579),
+                                         ("1-02:03:04", 93784), ("INVALID", 0)]:
+            result = self.worker.parse_elapsed(elapsed)
+            assert result == expected_result, "{} != {}".format(result, expected_result)
+
+    ####
+    #### tests for getWaitDuration()
+    ####
+
+    def test_getWaitDuration_cached(self):
+        calls = []
+
+        def call_scontrol_config(args):
+            calls.append(args)
+            return "AcctGatherNodeFreq      = 0 sec\nSchedulerTimeSlice      = 30 sec\n"
+
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_scontrol_config)
+        batch_system = toil.batchSystems.slurm.SlurmBatchSystem
+        batch_system._reset_wait_duration()
+        try:
+            assert batch_system.getWaitDuration() == 36
+            assert batch_system.getWaitDuration() == 36
+            assert calls == [['scontrol', 'show', 'config']], calls
+        finally:
+            batch_system._reset_wait_duration()
+
+    ####
+    #### tests for prepareSbatch()
+    ####
+
+    def test_prepareSbatch_quotes_environment(self):
+        self.monkeypatch.setattr(toil.batchSystems.slurm.os, "popen", lambda *_: io.StringIO("normal\n"))
+        environment = {"PLAIN": "value", "SPECIAL": "it's a \"$HOME\" & more; `x`"}
+        self.worker.boss.environment = {"PLAIN": "value"}
+        line = self.worker.prepareSbatch(1, None, "normal", None, 5, "job", environment)
+        exports = [arg for arg in line if arg.startswith('--export=')]
+        assert len(exports) == 1, line
+        assert dict(shlex.split(pair)[0].split('=', 1)
+                    for pair in exports[0][len('--export='):].split(',')) == environment
+
     ####
     #### tests for _getJobDetailsFromSacct()
     ####
 
     def test_getJobDetailsFromSacct_one_exists(self):
-        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_sacct)
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_sacct)
         expected_result = {785023: ("FAILED", 127)}
         result = self.worker._getJobDetailsFromSacct(list(expected_result))
         assert result == expected_result, "{} != {}".format(result, expected_result)
 
     def test_getJobDetailsFromSacct_one_not_exists(self):
-        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_sacct)
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_sacct)
         expected_result = {1234: (None, None)}
         result = self.worker._getJobDetailsFromSacct(list(expected_result))
         assert result == expected_result, "{} != {}".format(result, expected_result)
 
     def test_getJobDetailsFromSacct_many_all_exist(self):
-        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_sacct)
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_sacct)
         expected_result = {754725: ("TIMEOUT", 0), 789456: ("FAILED", 1), 789724: ("RUNNING", 0),
                            789868: ("PENDING", 0), 789869: ("COMPLETED", 0)}
         result = self.worker._getJobDetailsFromSacct(list(expected_result))
         assert result == expected_result, "{} != {}".format(result, expected_result)
 
     def test_getJobDetailsFromSacct_many_some_exist(self):
-        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_sacct)
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_sacct)
         expected_result = {609663: ("FAILED", 130), 767925: ("FAILED", 2), 1234: (None, None),
                            1235: (None, None), 765096: ("FAILED", 137)}
         result = self.worker._getJobDetailsFromSacct(list(expected_result))
         assert result == expected_result, "{} != {}".format(result, expected_result)
 
     def test_getJobDetailsFromSacct_many_none_exist(self):
-        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_sacct)
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_sacct)
         expected_result = {1234: (None, None), 1235: (None, None), 1236: (None, None)}
         result = self.worker._getJobDetailsFromSacct(list(expected_result))
         assert result == expected_result, "{} != {}".format(result, expected_result)
 
+    def test_getJobDetailsFromSacct_chunked(self):
+        calls = []
+
+        def recording_sacct(args):
+            calls.append(args[3])
+            return iter_sacct(args)
+
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", recording_sacct)
+        self.monkeypatch.setenv("TOIL_SLURM_SACCT_CHUNK", "2")
+        self.worker = self.make_worker()
+        expected_result = {754725: ("TIMEOUT", 0), 789456: ("FAILED", 1), 789724: ("RUNNING", 0),
+                           1234: (None, None), 789869: ("COMPLETED", 0)}
+        result = self.worker._getJobDetailsFromSacct(list(expected_result))
+        assert result == expected_result, "{} != {}".format(result, expected_result)
+        assert calls == ["754725,789456", "789724,1234", "789869"], calls
+
+    def test_sacct_chunk_size_invalid(self):
+        """
+        A chunk size that isn't a positive integer should be rejected up front.
+        """
+        for value in ["0", "-5", "lots"]:
+            self.monkeypatch.setenv("TOIL_SLURM_SACCT_CHUNK", value)
+            with pytest.raises(ValueError, match="TOIL_SLURM_SACCT_CHUNK"):
+                self.make_worker()
+
+    def test_getJobDetailsFromSacct_coalesced(self):
+        """
+        Lookups made while `sacct` is already running should be answered by a single
+        further `sacct` call.
+        """
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def blocking_sacct(args):
+            calls.append(args[3])
+            started.set()
+            release.wait()
+            return iter_sacct(args)
+
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", blocking_sacct)
+        batcher = toil.batchSystems.slurm._SacctBatcher
+        first = batcher.submit([785023])
+        assert started.wait(10)
+        second = batcher.submit([789456, 1234])
+        third = batcher.submit([789869, 789456])
+        release.set()
+        assert first.result(10) == {785023: ("FAILED", 127)}
+        assert second.result(10) == {789456: ("FAILED", 1), 1234: (None, None)}
+        assert third.result(10) == {789869: ("COMPLETED", 0), 789456: ("FAILED", 1)}
+        assert calls == ["785023", "789456,1234,789869"], calls
+
     ####
     #### tests for _getJobDetailsFromScontrol()
     ####
 
     def test_getJobDetailsFromScontrol_one_exists(self):
-        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_scontrol)
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_scontrol)
         expected_result = {789724: ("RUNNING", 0)}
         result = self.worker._getJobDetailsFromScontrol(list(expected_result))
         assert result == expected_result, "{} != {}".format(result, expected_result)
@@ -247,7 +423,7 @@ class SlurmTest(ToilTest):
         Asking for the job details of a single job that `scontrol` doesn't know about should
         raise an exception.
         """
-        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_scontrol)
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_scontrol)
         expected_result = {1234: (None, None)}
         try:
             _ = self.worker._getJobDetailsFromScontrol(list(expected_result))
@@ -257,19 +433,19 @@ class SlurmTest(ToilTest):
             assert False, "Expected exception CalledProcessErrorStderr"
 
     def test_getJobDetailsFromScontrol_many_all_exist(self):
-        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_scontrol)
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_scontrol)
         expected_result = {787204: ("COMPLETED", 0), 789724: ("RUNNING", 0), 789728: ("PENDING", 0)}
         result = self.worker._getJobDetailsFromScontrol(list(expected_result))
         assert result == expected_result, "{} != {}".format(result, expected_result)
 
     def test_getJobDetailsFromScontrol_many_some_exist(self):
-        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_scontrol)
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_scontrol)
         expected_result = {787204: ("COMPLETED", 0), 789724: ("RUNNING", 0), 1234: (None, None)}
         result = self.worker._getJobDetailsFromScontrol(list(expected_result))
         assert result == expected_result, "{} != {}".format(result, expected_result)
 
     def test_getJobDetailsFromScontrol_many_none_exist(self):
-        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_scontrol)
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_scontrol)
         expected_result = {1234: (None, None), 1235: (None, None), 1236: (None, None)}
         result = self.worker._getJobDetailsFromScontrol(list(expected_result))
         assert result == expected_result, "{} != {}".format(result, expected_result)
@@ -279,14 +455,14 @@ class SlurmTest(ToilTest):
     ###
 
     def test_getJobExitCode_job_exists(self):
-        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_sacct)
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_sacct)
         job_id = '785023'  # FAILED
         expected_result = 127
         result = self.worker.getJobExitCode(job_id)
         assert result == expected_result, "{} != {}".format(result, expected_result)
 
     def test_getJobExitCode_job_not_exists(self):
-        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_sacct)
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_sacct)
         job_id = '1234'  # Non-existent
         expected_result = None
         result = self.worker.getJobExitCode(job_id)
@@ -298,7 +474,7 @@ class SlurmTest(ToilTest):
         raise an exception.
         """
         self.monkeypatch.setattr(self.worker, "_getJobDetailsFromSacct", call_sacct_raises)
-        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_scontrol)
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_scontrol)
         job_id = '787204'  # COMPLETED
         expected_result = 0
         result = self.worker.getJobExitCode(job_id)
@@ -310,7 +486,7 @@ class SlurmTest(ToilTest):
         raise an exception. Next, `scontrol` should also raise because it doesn't know the job.
         """
         self.monkeypatch.setattr(self.worker, "_getJobDetailsFromSacct", call_sacct_raises)
-        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_scontrol)
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_scontrol)
         job_id = '1234'  # Non-existent
         try:
             _ = self.worker.getJobExitCode(job_id)
@@ -319,26 +495,55 @@ class SlurmTest(ToilTest):
         else:
             assert False, "Exception CalledProcessErrorStderr not raised"
 
+    def test_getJobExitCode_finished_job_cached(self):
+        """
+        Once a job has finished, its exit code should be remembered rather than asked for again.
+        """
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_sacct)
+        assert self.worker.getJobExitCode('785023') == 127  # FAILED
+        assert self.worker.getJobExitCode('789724') is None  # RUNNING
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", call_sacct_raises)
+        self.monkeypatch.setattr(self.worker, "_getJobDetailsFromScontrol", call_sacct_raises)
+        assert self.worker.getJobExitCode('785023') == 127
+        try:
+            _ = self.worker.getJobExitCode('789724')
+        except CalledProcessErrorStderr:
+            pass
+        else:
+            assert False, "Running job was not looked up again"
+
+    def test_forgetJob_drops_finished_job(self):
+        """
+        Once a finished job has been reported, its exit code shouldn't be kept.
+        """
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_sacct)
+        self.worker.batchJobIDs[1] = (785023, None)
+        self.worker.runningJobs.add(1)
+        assert self.worker.getJobExitCode('785023') == 127  # FAILED
+        assert 785023 in self.worker._terminal_cache
+        self.worker.forgetJob(1)
+        assert 785023 not in self.worker._terminal_cache
+
     ###
     ### Tests for coalesce_job_exit_codes
     ###
 
     def test_coalesce_job_exit_codes_one_exists(self):
-        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_sacct)
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_sacct)
         job_ids = ['785023']  # FAILED
         expected_result = [127]
         result = self.worker.coalesce_job_exit_codes(job_ids)
         assert result == expected_result, "{} != {}".format(result, expected_result)
 
     def test_coalesce_job_exit_codes_one_not_exists(self):
-        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_sacct)
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_sacct)
         job_ids = ['1234']  # Non-existent
         expected_result = [None]
         result = self.worker.coalesce_job_exit_codes(job_ids)
         assert result == expected_result, "{} != {}".format(result, expected_result)
 
     def test_coalesce_job_exit_codes_many_all_exist(self):
-        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_sacct)
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_sacct)
         job_ids = ['754725',  # TIMEOUT,
                    '789456',  # FAILED,
                    '789724',  # RUNNING,
@@ -349,7 +554,7 @@ class SlurmTest(ToilTest):
         assert result == expected_result, "{} != {}".format(result, expected_result)
 
     def test_coalesce_job_exit_codes_some_exists(self):
-        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_sacct)
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_sacct)
         job_ids = ['609663',  # FAILED (SIGINT)
                    '767925',  # FAILED,
                    '789724',  # RUNNING,
@@ -365,7 +570,7 @@ class SlurmTest(ToilTest):
         raise an exception.
         """
         self.monkeypatch.setattr(self.worker, "_getJobDetailsFromSacct", call_sacct_raises)
-        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_scontrol)
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_scontrol)
         job_ids = ['787204']  # COMPLETED
         expected_result = [0]
         result = self.worker.coalesce_job_exit_codes(job_ids)
@@ -377,7 +582,7 @@ class SlurmTest(ToilTest):
         raise an exception. Next, `scontrol` should also raise because it doesn't know the job.
         """
         self.monkeypatch.setattr(self.worker, "_getJobDetailsFromSacct", call_sacct_raises)
-        self.monkeypatch.setattr(toil.batchSystems.slurm, "call_command", call_scontrol)
+        self.monkeypatch.setattr(toil.batchSystems.slurm, "iter_command", iter_scontrol)
         job_ids = ['1234']  # Non-existent
         try:
             _ = self.worker.coalesce_job_exit_codes(job_ids)
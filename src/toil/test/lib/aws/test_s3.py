@@ -14,10 +14,11 @@
 import logging
 import os
 import uuid
+from itertools import islice
 from typing import Optional
 
 from toil.jobStores.aws.jobStore import AWSJobStore
-from toil.lib.aws.utils import create_s3_bucket, get_bucket_region
+from toil.lib.aws.utils import create_s3_bucket, full_jitter_delays, get_bucket_region, prefetch
 from toil.lib.aws.session import establish_boto3_session
 from toil.test import ToilTest, needs_aws_s3
 
@@ -61,3 +62,31 @@ class S3Test(ToilTest):
         if cls.bucket:
             AWSJobStore._delete_bucket(cls.bucket)
         super().tearDownClass()
+
+
+class S3RetryTest(ToilTest):
+    """Check the delays S3 operations are retried with."""
+
+    def test_full_jitter_delays(self) -> None:
+        delays = list(islice(full_jitter_delays(base=1, cap=10), 100))
+        for attempt, delay in enumerate(delays):
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(10, 2 ** attempt))
+        # The delays should actually be spread out
+        self.assertGreater(len(set(delays)), 1)
+
+
+class S3PrefetchTest(ToilTest):
+    """Check the page prefetching used when emptying buckets."""
+
+    def test_prefetch(self) -> None:
+        self.assertEqual(list(prefetch(iter([1, None, 3]), 2)), [1, None, 3])
+
+    def test_prefetch_error(self) -> None:
+        def pages():
+            yield 1
+            raise RuntimeError("listing failed")
+        items = prefetch(pages(), 2)
+        self.assertEqual(next(items), 1)
+        with self.assertRaises(RuntimeError):
+            next(items)
@@ -15,7 +15,7 @@ import logging
 
 import getpass
 
-from toil.lib.misc import get_user_name
+from toil.lib.misc import CalledProcessErrorStderr, get_user_name, iter_command
 from toil.test import ToilTest
 
 logger = logging.getLogger(__name__)
@@ -81,3 +81,21 @@ class UserNameVeryBrokenTest(ToilTest):
         self.assertTrue(isinstance(apparent_user_name, str))
         self.assertNotEqual(apparent_user_name, '')
 
+
+class IterCommandTest(ToilTest):
+    """
+    Make sure we can stream the output of commands.
+    """
+
+    def test_iter_command(self):
+        lines = list(iter_command(['printf', 'first\nsecond\n\nlast']))
+        self.assertEqual(lines, ['first', 'second', '', 'last'])
+
+    def test_iter_command_fails(self):
+        lines = []
+        with self.assertRaises(CalledProcessErrorStderr) as context:
+            for line in iter_command(['sh', '-c', 'echo out; echo oops >&2; exit 3']):
+                lines.append(line)
+        self.assertEqual(lines, ['out'])
+        self.assertEqual(context.exception.returncode, 3)
+        self.assertIn('oops', context.exception.stderr)
@@ -13,6 +13,7 @@
 # limitations under the License.
 """Delete a job store used by a previous Toil workflow invocation."""
 import logging
+from typing import List, Optional
 
 from toil.common import Toil, parser_with_common_options
 from toil.jobStores.abstractJobStore import NoSuchJobStoreException
@@ -21,10 +22,10 @@ from toil.statsAndLogging import set_logging_from_options
 logger = logging.getLogger(__name__)
 
 
-def main() -> None:
+def main(args: Optional[List[str]] = None) -> None:
     parser = parser_with_common_options(jobstore_option=True)
 
-    options = parser.parse_args()
+    options = parser.parse_args(args)
     set_logging_from_options(options)
     try:
         jobstore = Toil.getJobStore(options.jobStore)
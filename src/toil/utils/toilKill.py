@@ -15,6 +15,7 @@
 import logging
 import os
 import signal
+from typing import List, Optional
 
 from toil.common import Config, Toil, parser_with_common_options
 from toil.jobStores.abstractJobStore import NoSuchJobStoreException
@@ -23,9 +24,9 @@ from toil.statsAndLogging import set_logging_from_options
 logger = logging.getLogger(__name__)
 
 
-def main() -> None:
+def main(args: Optional[List[str]] = None) -> None:
     parser = parser_with_common_options()
-    options = parser.parse_args()
+    options = parser.parse_args(args)
     set_logging_from_options(options)
     config = Config()
     config.setOptions(options)